@@ -8,10 +8,12 @@ Manages task lifecycle: submitted → working → completed/failed.
 
 from __future__ import annotations
 
+import os
 import threading
-import uuid
-from datetime import datetime
-from typing import Optional
+import time
+from collections import OrderedDict
+from itertools import islice
+from typing import Callable, Optional, Union
 
 from models import (
     Artifact,
@@ -23,7 +25,9 @@ from models import (
     TaskQueryParams,
     TaskSendParams,
     TaskState,
+    TaskArtifactUpdateEvent,
     TaskStatus,
+    TaskStatusUpdateEvent,
     TextPart,
 )
 
@@ -31,48 +35,249 @@ from models import (
 import agent
 
 
-class TaskStore:
-    """Thread-safe in-memory task store."""
+# States in which a task can still be canceled
+_ACTIVE_STATES = frozenset({TaskState.SUBMITTED, TaskState.WORKING})
+
+# States after which a task never changes again (eligible for eviction)
+_TERMINAL_STATES = frozenset({TaskState.COMPLETED, TaskState.FAILED, TaskState.CANCELED})
+
+# How often each shard is swept for expired tasks, in seconds
+_SWEEP_INTERVAL = 180.0
+
+
+class _Shard:
+    """One lock-striped partition of the TaskStore."""
+
+    __slots__ = ("tasks", "lock", "next_sweep")
 
     def __init__(self) -> None:
-        self._tasks: dict[str, Task] = {}
-        self._lock = threading.Lock()
+        # task_id -> (last write time, task), oldest write first
+        self.tasks: OrderedDict[str, tuple[float, Task]] = OrderedDict()
+        self.lock = threading.Lock()
+        self.next_sweep = 0.0
+
+
+class TaskStore:
+    """
+    Thread-safe in-memory task store.
+
+    Tasks are spread across a fixed number of shards, each guarded by its
+    own lock, so concurrent requests for different tasks don't serialize
+    behind a single mutex.
+
+    Tasks in a terminal state that haven't been written for ``ttl`` seconds
+    are evicted in batches, at most once per sweep interval per shard.
+    A ``ttl`` of 0 keeps tasks forever.
+    """
+
+    def __init__(self, shards: int = 16, ttl: float = 3600.0) -> None:
+        if shards < 1 or shards & (shards - 1):
+            raise ValueError("shards must be a power of two")
+        self._mask = shards - 1
+        self._ttl = ttl
+        self._shards = [_Shard() for _ in range(shards)]
+
+    def _shard(self, task_id: str) -> _Shard:
+        return self._shards[hash(task_id) & self._mask]
 
     def get(self, task_id: str) -> Optional[Task]:
-        with self._lock:
-            return self._tasks.get(task_id)
+        shard = self._shard(task_id)
+        with shard.lock:
+            entry = shard.tasks.get(task_id)
+        return entry[1] if entry is not None else None
 
     def set(self, task: Task) -> None:
-        with self._lock:
-            self._tasks[task.id] = task
+        shard = self._shard(task.id)
+        with shard.lock:
+            self._put(shard, task)
+
+    def update(self, task: Task, mutate: Callable[[Task], bool]) -> bool:
+        """
+        Apply ``mutate`` to ``task`` and store it, atomically with respect to
+        other updates of tasks in the same shard.
+
+        ``mutate`` runs under the shard lock, so it sees the task's current
+        state; if it returns False the task is left unchanged and not stored.
+        """
+        shard = self._shard(task.id)
+        with shard.lock:
+            if not mutate(task):
+                return False
+            self._put(shard, task)
+        return True
+
+    def _put(self, shard: _Shard, task: Task) -> None:
+        """Store ``task`` and sweep the shard if due. Caller holds the lock."""
+        now = time.monotonic()
+        shard.tasks[task.id] = (now, task)
+        shard.tasks.move_to_end(task.id)
+        if self._ttl > 0 and now >= shard.next_sweep:
+            self._evict_expired(shard, now - self._ttl)
+            shard.next_sweep = now + _SWEEP_INTERVAL
 
     def delete(self, task_id: str) -> bool:
-        with self._lock:
-            return self._tasks.pop(task_id, None) is not None
+        shard = self._shard(task_id)
+        with shard.lock:
+            return shard.tasks.pop(task_id, None) is not None
+
+    @staticmethod
+    def _evict_expired(shard: _Shard, cutoff: float) -> None:
+        """Drop terminal tasks last written before ``cutoff``. Caller holds the lock."""
+        expired = []
+        for task_id, (written, task) in shard.tasks.items():
+            if written >= cutoff:
+                break
+            if task.status.state in _TERMINAL_STATES:
+                expired.append(task_id)
+        for task_id in expired:
+            del shard.tasks[task_id]
 
 
 # Global task store
-task_store = TaskStore()
+task_store = TaskStore(ttl=float(os.getenv("A2A_TASK_TTL_SEC", "3600")))
 
 
 def _extract_question(message: Message) -> str:
     """Extract the text question from a Message's parts."""
+    parts = message.parts
+    # Fast path: the common case is a single text part
+    if len(parts) == 1 and isinstance(parts[0], TextPart):
+        return parts[0].text.strip()
+
     texts = []
-    for part in message.parts:
+    for part in parts:
         if isinstance(part, TextPart):
             texts.append(part.text)
-        elif isinstance(part, dict):
-            # Handle raw dict from JSON deserialization
-            if part.get("type") == "text":
-                texts.append(part.get("text", ""))
     return " ".join(texts).strip()
 
 
+# (epoch second, formatted "YYYY-MM-DDTHH:MM:SS") for the last timestamp.
+# Swapped as one tuple so concurrent readers never see a torn pair.
+_ts_prefix: tuple[int, str] = (-1, "")
+
+
 def _now_iso() -> str:
-    return datetime.utcnow().isoformat() + "Z"
+    """Current UTC time as ISO 8601 with microseconds and a Z suffix."""
+    global _ts_prefix
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _ts_prefix
+    if second != cached_second:
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+        _ts_prefix = (second, prefix)
+    return f"{prefix}.{int((now - second) * 1_000_000):06d}Z"
+
+
+def new_id() -> str:
+    """Return a random 128-bit identifier as 32 hex characters."""
+    return os.urandom(16).hex()
+
+
+def _agent_message(text: str) -> Message:
+    """Build a text message from the agent."""
+    return Message.model_construct(
+        role="agent", parts=[TextPart.model_construct(text=text)], metadata=None
+    )
+
+
+# Receives streaming updates from handle_task_send (called on the worker thread)
+EventCallback = Callable[[Union[TaskStatusUpdateEvent, TaskArtifactUpdateEvent]], None]
+
+
+def _transition(
+    task: Task,
+    state: TaskState,
+    message: Optional[Message] = None,
+    record: bool = False,
+    on_event: Optional[EventCallback] = None,
+    incoming: Optional[Message] = None,
+    artifacts: Optional[list[Artifact]] = None,
+) -> bool:
+    """
+    Move a task to a new state and persist it.
+
+    The previous status is pushed onto the history and, when ``record`` is
+    set, the status message is also appended to the conversation.
+    ``incoming`` (a user message) is appended ahead of that, and
+    ``artifacts`` replace the task's artifacts. All of this happens under
+    the task's store lock — callers must never hold the store across
+    long-running work such as the agent pipeline.
+
+    tasks/send runs on a worker thread while tasks/cancel may arrive on
+    another, so the current state is re-read under the lock: a task that
+    has already finished (completed, failed or canceled) is never moved to
+    another terminal state. Returns False, without touching the task or
+    emitting events, when the transition is skipped.
+
+    Lists on a stored task are copy-on-write: appends build a new list and
+    swap the attribute, so a concurrent tasks/get serializing the task sees
+    either the old or the new list, never one being mutated.
+    """
+
+    def apply(t: Task) -> bool:
+        if state in _TERMINAL_STATES and t.status.state in _TERMINAL_STATES:
+            return False
+        if incoming is not None:
+            t.messages = [*t.messages, incoming]
+        if artifacts is not None:
+            t.artifacts = artifacts
+        t.history = [*t.history, t.status]
+        t.status = TaskStatus.model_construct(
+            state=state, message=message, timestamp=_now_iso()
+        )
+        if record and message is not None:
+            t.messages = [*t.messages, message]
+        return True
+
+    if not task_store.update(task, apply):
+        return False
+    if on_event is not None:
+        for artifact in artifacts or ():
+            on_event(
+                TaskArtifactUpdateEvent.model_construct(
+                    id=task.id, artifact=artifact, metadata=None
+                )
+            )
+        on_event(
+            TaskStatusUpdateEvent.model_construct(
+                id=task.id,
+                status=task.status,
+                final=state in _TERMINAL_STATES,
+                metadata=None,
+            )
+        )
+    return True
 
 
-def handle_task_send(params: TaskSendParams) -> Task:
+def _finish(
+    task: Task,
+    state: TaskState,
+    message: Message,
+    record: bool = False,
+    on_event: Optional[EventCallback] = None,
+    artifacts: Optional[list[Artifact]] = None,
+) -> None:
+    """
+    Make the terminal transition of a tasks/send run.
+
+    If the task already ended meanwhile (a tasks/cancel landed while the
+    pipeline ran), the transition is skipped, but subscribers are still sent
+    the task's current status as the ``final`` event so the stream closes
+    the way the protocol promises.
+    """
+    if _transition(task, state, message, record, on_event, artifacts=artifacts):
+        return
+    if on_event is not None:
+        on_event(
+            TaskStatusUpdateEvent.model_construct(
+                id=task.id, status=task.status, final=True, metadata=None
+            )
+        )
+
+
+def handle_task_send(
+    params: TaskSendParams, on_event: Optional[EventCallback] = None
+) -> Task:
     """
     Handle tasks/send — process a user message synchronously.
 
@@ -81,77 +286,67 @@ def handle_task_send(params: TaskSendParams) -> Task:
     3. Runs the Text-to-SQL pipeline via agent.process_question()
     4. Transitions to 'completed' (or 'failed')
     5. Returns the updated task
+
+    The store is only touched for the state transitions; the pipeline itself
+    runs lock-free so tasks/get polling is never blocked behind it.
+
+    Everything built here is server-side data of a known shape, so models
+    are created with model_construct() and skip validation; user input was
+    already validated as TaskSendParams at the RPC boundary.
+
+    If ``on_event`` is given (tasks/sendSubscribe), it is called with a
+    status event after every transition and an artifact event for each
+    artifact, as they happen; the last event always has ``final`` set.
     """
-    task_id = params.id or str(uuid.uuid4())
+    task_id = params.id or new_id()
 
     # Check for existing task
     task = task_store.get(task_id)
 
     if task is None:
-        task = Task(
+        task = Task.model_construct(
             id=task_id,
-            sessionId=params.sessionId or str(uuid.uuid4()),
-            status=TaskStatus(state=TaskState.SUBMITTED, timestamp=_now_iso()),
+            sessionId=params.sessionId or new_id(),
+            status=TaskStatus.model_construct(
+                state=TaskState.SUBMITTED, message=None, timestamp=_now_iso()
+            ),
             messages=[],
             artifacts=[],
             history=[],
             metadata=params.metadata,
         )
 
-    # Append user message
-    task.messages.append(params.message)
-
-    # Transition to working
-    working_status = TaskStatus(state=TaskState.WORKING, timestamp=_now_iso())
-    task.history.append(task.status)
-    task.status = working_status
-    task_store.set(task)
+    # Append user message and transition to working
+    _transition(task, TaskState.WORKING, on_event=on_event, incoming=params.message)
 
     # Extract question text
     question = _extract_question(params.message)
 
     if not question:
         # No question found — fail
-        fail_msg = Message(
-            role="agent",
-            parts=[TextPart(text="No question found in the message. Please send a text question.")],
+        fail_msg = _agent_message(
+            "No question found in the message. Please send a text question."
         )
-        fail_status = TaskStatus(
-            state=TaskState.FAILED,
-            message=fail_msg,
-            timestamp=_now_iso(),
-        )
-        task.history.append(task.status)
-        task.status = fail_status
-        task_store.set(task)
+        _finish(task, TaskState.FAILED, fail_msg, on_event=on_event)
         return task
 
     try:
-        # Run the Text-to-SQL pipeline
+        # Run the Text-to-SQL pipeline (outside any store lock)
         result = agent.process_question(question)
 
         if result.get("error"):
             # Pipeline returned an error
-            error_msg = Message(
-                role="agent",
-                parts=[TextPart(text=f"Error processing query: {result['error']}")],
-            )
-            fail_status = TaskStatus(
-                state=TaskState.FAILED,
-                message=error_msg,
-                timestamp=_now_iso(),
-            )
-            task.history.append(task.status)
-            task.status = fail_status
-            task.messages.append(error_msg)
-            task_store.set(task)
+            error_msg = _agent_message(f"Error processing query: {result['error']}")
+            _finish(task, TaskState.FAILED, error_msg, record=True, on_event=on_event)
             return task
 
         # Build the agent response message
-        answer_text = result.get("answer", "No answer generated.")
-        agent_msg = Message(
-            role="agent",
-            parts=[TextPart(text=answer_text)],
+        # The answer part is shared by the message and artifact 0; parts are
+        # never mutated after construction.
+        answer_text = result.get("answer") or "No answer generated."
+        answer_part = TextPart.model_construct(text=answer_text)
+        agent_msg = Message.model_construct(
+            role="agent", parts=[answer_part], metadata=None
         )
 
         # Build artifacts with structured data
@@ -159,58 +354,50 @@ def handle_task_send(params: TaskSendParams) -> Task:
 
         # Artifact 0: The natural language answer
         artifacts.append(
-            Artifact(
+            Artifact.model_construct(
                 name="answer",
                 description="Natural language answer to the user's question",
-                parts=[TextPart(text=answer_text)],
+                parts=[answer_part],
                 index=0,
+                metadata=None,
             )
         )
 
-        # Artifact 1: Structured result data (SQL, columns, rows)
+        # Artifact 1: Structured result data (SQL, columns, rows).
+        # Only the first 50 rows are converted; the rest are just counted.
+        rows = result.get("rows", [])
         structured_data = {
             "question": result.get("question", question),
             "sql": result.get("sql"),
             "columns": result.get("columns", []),
-            "rows": [list(row) for row in result.get("rows", [])][:50],
-            "row_count": len(result.get("rows", [])),
+            "rows": [list(row) for row in islice(rows, 50)],
+            "row_count": len(rows),
+            "truncated": result.get("truncated", False),
         }
         artifacts.append(
-            Artifact(
+            Artifact.model_construct(
                 name="query_result",
                 description="Structured SQL query and result data",
-                parts=[DataPart(data=structured_data)],
+                parts=[DataPart.model_construct(data=structured_data)],
                 index=1,
+                metadata=None,
             )
         )
 
-        # Transition to completed
-        completed_status = TaskStatus(
-            state=TaskState.COMPLETED,
-            message=agent_msg,
-            timestamp=_now_iso(),
+        # Transition to completed (skipped if the task was canceled meanwhile)
+        _finish(
+            task,
+            TaskState.COMPLETED,
+            agent_msg,
+            record=True,
+            on_event=on_event,
+            artifacts=artifacts,
         )
-        task.history.append(task.status)
-        task.status = completed_status
-        task.messages.append(agent_msg)
-        task.artifacts = artifacts
-        task_store.set(task)
         return task
 
     except Exception as e:
-        error_msg = Message(
-            role="agent",
-            parts=[TextPart(text=f"Internal error: {str(e)}")],
-        )
-        fail_status = TaskStatus(
-            state=TaskState.FAILED,
-            message=error_msg,
-            timestamp=_now_iso(),
-        )
-        task.history.append(task.status)
-        task.status = fail_status
-        task.messages.append(error_msg)
-        task_store.set(task)
+        error_msg = _agent_message(f"Internal error: {str(e)}")
+        _finish(task, TaskState.FAILED, error_msg, record=True, on_event=on_event)
         return task
 
 
@@ -224,10 +411,11 @@ def handle_task_get(params: TaskQueryParams) -> Optional[Task]:
         return None
 
     if params.historyLength is not None:
-        # Return only the last N history entries
-        task_copy = task.model_copy(deep=True)
-        task_copy.history = task_copy.history[-params.historyLength :]
-        return task_copy
+        # Return only the last N history entries. A shallow copy is enough:
+        # TaskStatus entries are never mutated once recorded.
+        return task.model_copy(
+            update={"history": task.history[-params.historyLength :]}
+        )
 
     return task
 
@@ -241,18 +429,9 @@ def handle_task_cancel(params: TaskCancelParams) -> Optional[Task]:
     if task is None:
         return None
 
-    if task.status.state in (TaskState.SUBMITTED, TaskState.WORKING):
-        cancel_msg = Message(
-            role="agent",
-            parts=[TextPart(text="Task was canceled by the user.")],
-        )
-        cancel_status = TaskStatus(
-            state=TaskState.CANCELED,
-            message=cancel_msg,
-            timestamp=_now_iso(),
-        )
-        task.history.append(task.status)
-        task.status = cancel_status
-        task_store.set(task)
+    if task.status.state in _ACTIVE_STATES:
+        # _transition re-checks under the lock in case the task just finished
+        cancel_msg = _agent_message("Task was canceled by the user.")
+        _transition(task, TaskState.CANCELED, cancel_msg)
 
     return task
@@ -11,8 +11,8 @@ Reference: https://google.github.io/A2A/
 from __future__ import annotations
 
 from datetime import datetime
-from enum import Enum
-from typing import Any, Optional
+from enum import StrEnum
+from typing import Annotated, Any, Literal, Optional, Union
 from pydantic import BaseModel, Field
 
 
@@ -79,7 +79,7 @@ class AgentCard(BaseModel):
 # -----------------------------------------------------------
 
 
-class TaskState(str, Enum):
+class TaskState(StrEnum):
     """Task lifecycle states per A2A spec."""
 
     SUBMITTED = "submitted"
@@ -93,26 +93,26 @@ class TaskState(str, Enum):
 class TextPart(BaseModel):
     """A text content part."""
 
-    type: str = "text"
+    type: Literal["text"] = "text"
     text: str
 
 
 class DataPart(BaseModel):
     """A structured data content part."""
 
-    type: str = "data"
+    type: Literal["data"] = "data"
     data: dict[str, Any]
 
 
 class FilePart(BaseModel):
     """A file content part."""
 
-    type: str = "file"
+    type: Literal["file"] = "file"
     file: dict[str, Any]
 
 
-# Union type for parts
-Part = TextPart | DataPart | FilePart
+# Union type for parts, discriminated on the "type" field
+Part = Annotated[Union[TextPart, DataPart, FilePart], Field(discriminator="type")]
 
 
 class Message(BaseModel):
@@ -153,6 +153,23 @@ class Task(BaseModel):
     metadata: Optional[dict[str, Any]] = None
 
 
+class TaskStatusUpdateEvent(BaseModel):
+    """Streamed by tasks/sendSubscribe when a task changes state."""
+
+    id: str
+    status: TaskStatus
+    final: bool = False
+    metadata: Optional[dict[str, Any]] = None
+
+
+class TaskArtifactUpdateEvent(BaseModel):
+    """Streamed by tasks/sendSubscribe when a task produces an artifact."""
+
+    id: str
+    artifact: Artifact
+    metadata: Optional[dict[str, Any]] = None
+
+
 # -----------------------------------------------------------
 # JSON-RPC models
 # -----------------------------------------------------------
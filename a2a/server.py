@@ -8,20 +8,31 @@ Text-to-SQL agentic pipeline as a discoverable remote agent.
 Any A2A-compatible client (GitHub Copilot, other AI agents) can:
   1. Discover this agent via GET /.well-known/agent.json
   2. Send tasks via POST / (JSON-RPC: tasks/send)
-  3. Query task status via POST / (JSON-RPC: tasks/get)
-  4. Cancel tasks via POST / (JSON-RPC: tasks/cancel)
+  3. Stream task updates via POST / (JSON-RPC: tasks/sendSubscribe, SSE)
+  4. Query task status via POST / (JSON-RPC: tasks/get)
+  5. Cancel tasks via POST / (JSON-RPC: tasks/cancel)
 
 Run:
-  uvicorn server:app --host 0.0.0.0 --port 8002
+  uvicorn server:app --host 0.0.0.0 --port 8002 --loop uvloop --http httptools
+
+uvloop and httptools come with uvicorn[standard].
 """
 
+import asyncio
+import hmac
+import json
 import os
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import partial
 from typing import Optional
 
 from fastapi import FastAPI, HTTPException, Request, Security, Depends
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from pydantic import BaseModel, ValidationError
+from pydantic_core import from_json
 from dotenv import load_dotenv
 
 from models import (
@@ -32,22 +43,60 @@ from models import (
     AgentSkill,
     JSONRPCRequest,
     JSONRPCResponse,
-    Message,
-    Part,
     TaskCancelParams,
     TaskQueryParams,
     TaskSendParams,
-    TextPart,
 )
-from handler import handle_task_cancel, handle_task_get, handle_task_send
 
+# Load .env before importing the handler, which reads its settings at import
 load_dotenv()
 
+from handler import handle_task_cancel, handle_task_get, handle_task_send, new_id
+
 # -----------------------------------------------------------
 # Configuration
 # -----------------------------------------------------------
-A2A_PORT = int(os.getenv("A2A_PORT", "8002"))
-HOST_URL = os.getenv("A2A_HOST_URL", f"http://localhost:{A2A_PORT}")
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Server settings, resolved once from the environment at startup."""
+
+    port: int
+    host_url: str
+    api_key: bytes  # empty = authentication disabled
+    workers: int
+    max_inflight: int
+    max_queued: int
+
+
+def _load_config() -> Config:
+    port = int(os.getenv("A2A_PORT", "8002"))
+    workers = int(os.getenv("A2A_WORKERS", "16"))
+    # More in-flight slots than executor threads would only move the
+    # backlog into the executor's unbounded queue, so cap at the pool size.
+    max_inflight = min(int(os.getenv("A2A_MAX_INFLIGHT", str(workers))), workers)
+    return Config(
+        port=port,
+        host_url=os.getenv("A2A_HOST_URL", f"http://localhost:{port}"),
+        api_key=os.getenv("API_KEY", "").encode(),
+        workers=workers,
+        max_inflight=max_inflight,
+        max_queued=int(os.getenv("A2A_MAX_QUEUED", "64")),
+    )
+
+
+CFG = _load_config()
+
+# Bounded pool for the blocking agent pipeline (LLM + SQL), so a slow
+# tasks/send never stalls the event loop for other clients.
+EXECUTOR = ThreadPoolExecutor(max_workers=CFG.workers, thread_name_prefix="a2a-task")
+
+# Caps concurrent pipeline runs (and so outbound LLM / SQL calls). Defaults
+# to, and never exceeds, A2A_WORKERS, so every admitted request has a thread
+# and nothing queues inside the executor. Requests beyond the cap wait for a
+# slot here; once A2A_MAX_QUEUED are already waiting, new ones are rejected
+# with 503 instead of piling up.
+_inflight = asyncio.Semaphore(CFG.max_inflight)
+_waiting = 0
 
 # -----------------------------------------------------------
 # FastAPI app
@@ -76,15 +125,15 @@ app.add_middleware(
 # -----------------------------------------------------------
 # API Key authentication (optional — same as Stage 2)
 # -----------------------------------------------------------
-API_KEY = os.getenv("API_KEY", "")
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 
 async def verify_api_key(api_key: Optional[str] = Security(api_key_header)):
     """Validate the X-API-Key header. Skip if no API_KEY is configured."""
-    if not API_KEY:
+    if not CFG.api_key:
         return
-    if api_key != API_KEY:
+    # Constant-time comparison so response timing doesn't leak the key
+    if not hmac.compare_digest((api_key or "").encode(), CFG.api_key):
         raise HTTPException(
             status_code=403,
             detail="Invalid or missing API key. Provide X-API-Key header.",
@@ -105,20 +154,20 @@ def build_agent_card() -> AgentCard:
             "result synthesis. Ask questions about customers, products, orders, "
             "revenue, and sales analytics."
         ),
-        url=HOST_URL,
+        url=CFG.host_url,
         version="3.0.0",
-        documentationUrl=f"{HOST_URL}/docs",
+        documentationUrl=f"{CFG.host_url}/docs",
         provider=AgentProvider(
             organization="Text-to-SQL Workshop",
-            url=HOST_URL,
+            url=CFG.host_url,
         ),
         capabilities=AgentCapabilities(
-            streaming=False,
+            streaming=True,
             pushNotifications=False,
             stateTransitionHistory=True,
         ),
         authentication=AgentAuthentication(
-            schemes=["apiKey"] if API_KEY else [],
+            schemes=["apiKey"] if CFG.api_key else [],
         ),
         defaultInputModes=["text"],
         defaultOutputModes=["text", "data"],
@@ -167,6 +216,10 @@ def build_agent_card() -> AgentCard:
     )
 
 
+# The card only depends on startup configuration, so serialize it once.
+_AGENT_CARD_JSON = build_agent_card().model_dump_json(exclude_none=True).encode()
+
+
 # -----------------------------------------------------------
 # JSON-RPC error helpers
 # -----------------------------------------------------------
@@ -184,36 +237,133 @@ def _jsonrpc_error(rpc_id, code: int, message: str, data=None) -> JSONResponse:
     )
 
 
-def _jsonrpc_success(rpc_id, result) -> JSONResponse:
+def _invalid_params(rpc_id, exc: ValidationError) -> JSONResponse:
+    """Return a -32602 error listing the params validation failures."""
+    return _jsonrpc_error(
+        rpc_id,
+        -32602,
+        "Invalid params",
+        exc.errors(include_url=False, include_context=False),
+    )
+
+
+def _server_busy(rpc_id) -> JSONResponse:
+    """Return a 503 JSON-RPC error telling the client to retry later."""
+    response = _jsonrpc_error(rpc_id, -32000, "Server busy: too many tasks in flight")
+    response.status_code = 503
+    response.headers["Retry-After"] = "5"
+    return response
+
+
+async def _run_blocking(handle, task_params):
+    """Run a blocking handler on the executor while holding an in-flight slot."""
+    global _waiting
+    _waiting += 1
+    try:
+        await _inflight.acquire()
+    finally:
+        _waiting -= 1
+    loop = asyncio.get_running_loop()
+    try:
+        future = EXECUTOR.submit(handle, task_params)
+    except BaseException:
+        _inflight.release()
+        raise
+    # Give the slot back when the thread is done, not when this coroutine
+    # is: a cancelled request (client gone) leaves the handler running.
+    future.add_done_callback(lambda _: _release_inflight(loop))
+    return await asyncio.wrap_future(future, loop=loop)
+
+
+def _release_inflight(loop: asyncio.AbstractEventLoop) -> None:
+    """Release an in-flight slot from an executor thread."""
+    if not loop.is_closed():
+        loop.call_soon_threadsafe(_inflight.release)
+
+
+def _jsonrpc_result_bytes(rpc_id, result: BaseModel) -> bytes:
+    """
+    Encode a JSON-RPC 2.0 success envelope.
+
+    The result model is serialized straight to JSON by pydantic, skipping
+    the intermediate dict and the stdlib encoder.
+    """
+    return b"".join(
+        (
+            b'{"jsonrpc":"2.0","id":',
+            json.dumps(rpc_id).encode(),
+            b',"result":',
+            result.model_dump_json(exclude_none=True).encode(),
+            b"}",
+        )
+    )
+
+
+def _jsonrpc_success(rpc_id, result: BaseModel) -> Response:
     """Return a JSON-RPC 2.0 success response."""
-    return JSONResponse(
-        content={
-            "jsonrpc": "2.0",
-            "id": rpc_id,
-            "result": result,
-        }
+    return Response(
+        content=_jsonrpc_result_bytes(rpc_id, result), media_type="application/json"
     )
 
 
-def _parse_message(raw: dict) -> Message:
-    """Parse a raw dict into a Message, handling Part union types."""
-    parts = []
-    for p in raw.get("parts", []):
-        if isinstance(p, dict):
-            ptype = p.get("type", "text")
-            if ptype == "text":
-                parts.append(TextPart(text=p.get("text", "")))
-            else:
-                parts.append(p)
-        else:
-            parts.append(p)
-    return Message(
-        role=raw.get("role", "user"),
-        parts=parts,
-        metadata=raw.get("metadata"),
+def _send_subscribe(rpc_id, send_params: TaskSendParams) -> StreamingResponse:
+    """
+    Run tasks/send and stream its progress as Server-Sent Events.
+
+    Each event is a JSON-RPC response whose result is a TaskStatusUpdateEvent
+    or TaskArtifactUpdateEvent; the last status event has ``final: true``.
+    The handler runs on the executor and hands events back to the event
+    loop through a queue as they happen.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+
+    def on_event(event) -> None:
+        loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    async def events():
+        pipeline = asyncio.ensure_future(
+            _run_blocking(partial(handle_task_send, on_event=on_event), send_params)
+        )
+        pipeline.add_done_callback(lambda _: queue.put_nowait(None))
+        while (event := await queue.get()) is not None:
+            yield b"data: " + _jsonrpc_result_bytes(rpc_id, event) + b"\n\n"
+        exc = pipeline.exception()
+        if exc is not None:
+            error = {"code": -32603, "message": f"Internal error: {str(exc)}"}
+            envelope = {"jsonrpc": "2.0", "id": rpc_id, "error": error}
+            yield b"data: " + json.dumps(envelope).encode() + b"\n\n"
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+def _parse_send(params: dict) -> TaskSendParams:
+    """Validate tasks/send params (including message parts), assigning an id if missing."""
+    return TaskSendParams.model_validate({**params, "id": params.get("id") or new_id()})
+
+
+def _parse_get(params: dict) -> TaskQueryParams:
+    """Build TaskQueryParams for tasks/get."""
+    return TaskQueryParams(
+        id=params.get("id", ""),
+        historyLength=params.get("historyLength"),
     )
 
 
+def _parse_cancel(params: dict) -> TaskCancelParams:
+    """Build TaskCancelParams for tasks/cancel."""
+    return TaskCancelParams(id=params.get("id", ""))
+
+
+# JSON-RPC method -> (params parser, handler, runs on the executor).
+# Only tasks/send does blocking work; get/cancel just touch the task store.
+_METHODS = {
+    "tasks/send": (_parse_send, handle_task_send, True),
+    "tasks/get": (_parse_get, handle_task_get, False),
+    "tasks/cancel": (_parse_cancel, handle_task_cancel, False),
+}
+
+
 # -----------------------------------------------------------
 # Routes
 # -----------------------------------------------------------
@@ -226,8 +376,7 @@ async def agent_card():
     A2A clients use this to discover the agent's capabilities, skills,
     and endpoint URL before sending tasks.
     """
-    card = build_agent_card()
-    return card.model_dump(exclude_none=True)
+    return Response(content=_AGENT_CARD_JSON, media_type="application/json")
 
 
 @app.post("/", dependencies=[Depends(verify_api_key)])
@@ -237,13 +386,16 @@ async def jsonrpc_endpoint(request: Request):
 
     Supported methods:
       - tasks/send       — Send a message and get a response
+      - tasks/sendSubscribe — Send a message and stream updates (SSE)
       - tasks/get        — Get task status and results
       - tasks/cancel     — Cancel a running task
     """
     try:
-        body = await request.json()
-    except Exception:
+        body = from_json(await request.body())
+    except ValueError:
         return _jsonrpc_error(None, -32700, "Parse error: invalid JSON")
+    if not isinstance(body, dict):
+        return _jsonrpc_error(None, -32600, "Invalid Request: expected a JSON object")
 
     # Validate JSON-RPC structure
     jsonrpc = body.get("jsonrpc")
@@ -259,78 +411,53 @@ async def jsonrpc_endpoint(request: Request):
     if not method:
         return _jsonrpc_error(rpc_id, -32600, "Invalid Request: method is required")
 
-    # -----------------------------------------------------------
-    # tasks/send
-    # -----------------------------------------------------------
-    if method == "tasks/send":
-        try:
-            # Parse the message properly
-            raw_message = params.get("message", {})
-            message = _parse_message(raw_message)
-
-            send_params = TaskSendParams(
-                id=params.get("id", ""),
-                sessionId=params.get("sessionId"),
-                message=message,
-                acceptedOutputModes=params.get("acceptedOutputModes", ["text"]),
-                metadata=params.get("metadata"),
-            )
-            if not send_params.id:
-                import uuid
-                send_params.id = str(uuid.uuid4())
-
-            task = handle_task_send(send_params)
-            return _jsonrpc_success(rpc_id, task.model_dump(exclude_none=True))
-
-        except Exception as e:
-            return _jsonrpc_error(rpc_id, -32603, f"Internal error: {str(e)}")
-
-    # -----------------------------------------------------------
-    # tasks/get
-    # -----------------------------------------------------------
-    elif method == "tasks/get":
-        try:
-            query_params = TaskQueryParams(
-                id=params.get("id", ""),
-                historyLength=params.get("historyLength"),
-            )
-            task = handle_task_get(query_params)
-            if task is None:
-                return _jsonrpc_error(
-                    rpc_id, -32001, "Task not found", {"taskId": params.get("id")}
-                )
-            return _jsonrpc_success(rpc_id, task.model_dump(exclude_none=True))
-
-        except Exception as e:
-            return _jsonrpc_error(rpc_id, -32603, f"Internal error: {str(e)}")
-
-    # -----------------------------------------------------------
-    # tasks/cancel
-    # -----------------------------------------------------------
-    elif method == "tasks/cancel":
-        try:
-            cancel_params = TaskCancelParams(id=params.get("id", ""))
-            task = handle_task_cancel(cancel_params)
-            if task is None:
-                return _jsonrpc_error(
-                    rpc_id, -32001, "Task not found", {"taskId": params.get("id")}
-                )
-            return _jsonrpc_success(rpc_id, task.model_dump(exclude_none=True))
-
-        except Exception as e:
-            return _jsonrpc_error(rpc_id, -32603, f"Internal error: {str(e)}")
-
-    # -----------------------------------------------------------
-    # Unknown method
-    # -----------------------------------------------------------
-    else:
+    entry = _METHODS.get(method)
+    if entry is None and method != "tasks/sendSubscribe":
         return _jsonrpc_error(
             rpc_id,
             -32601,
             f"Method not found: {method}",
-            {"supportedMethods": ["tasks/send", "tasks/get", "tasks/cancel"]},
+            {"supportedMethods": [*_METHODS, "tasks/sendSubscribe"]},
         )
 
+    # Every supported method takes named params; the parsers expect a dict
+    if not isinstance(params, dict):
+        return _jsonrpc_error(
+            rpc_id, -32602, "Invalid params: params must be a JSON object"
+        )
+
+    if entry is None:  # tasks/sendSubscribe
+        try:
+            send_params = _parse_send(params)
+        except ValidationError as e:
+            return _invalid_params(rpc_id, e)
+        if _inflight.locked() and _waiting >= CFG.max_queued:
+            return _server_busy(rpc_id)
+        return _send_subscribe(rpc_id, send_params)
+
+    parse, handle, blocking = entry
+
+    try:
+        task_params = parse(params)
+    except ValidationError as e:
+        return _invalid_params(rpc_id, e)
+
+    try:
+        if blocking:
+            if _inflight.locked() and _waiting >= CFG.max_queued:
+                return _server_busy(rpc_id)
+            task = await _run_blocking(handle, task_params)
+        else:
+            task = handle(task_params)
+        if task is None:
+            return _jsonrpc_error(
+                rpc_id, -32001, "Task not found", {"taskId": params.get("id")}
+            )
+        return _jsonrpc_success(rpc_id, task)
+
+    except Exception as e:
+        return _jsonrpc_error(rpc_id, -32603, f"Internal error: {str(e)}")
+
 
 # -----------------------------------------------------------
 # Convenience endpoints (non-A2A, for debugging)
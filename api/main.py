@@ -7,6 +7,7 @@ by Microsoft Copilot Studio or any HTTP client.
 
 Endpoints:
   POST /api/ask      — Send a natural language question, receive SQL + answer
+  POST /api/ask/stream — Same, streamed as Server-Sent Events
   GET  /api/schema   — Return the discovered database schema
   GET  /api/health   — Health check
 
@@ -14,17 +15,25 @@ Authentication:
   All /api/* endpoints require X-API-Key header matching API_KEY env var.
 
 Run:
-  uvicorn main:app --host 0.0.0.0 --port 8000
+  uvicorn main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools
+  (uvloop and httptools come with uvicorn[standard])
 """
 
+import hashlib
+import logging
 import os
 import time
+from contextlib import asynccontextmanager
+from itertools import islice
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException, Security, Depends
+import anyio.to_thread
+from fastapi import FastAPI, HTTPException, Request, Response, Security, Depends
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from pydantic_core import to_json
 from dotenv import load_dotenv
 
 # Import the existing agent module (same directory on VM)
@@ -32,6 +41,38 @@ import agent
 
 load_dotenv()
 
+logger = logging.getLogger("text2sql-api")
+
+# The agent pipeline is blocking (pyodbc + OpenAI SDK), so its endpoints
+# are plain ``def`` and run in the AnyIO worker threadpool. The default of
+# 40 threads caps concurrent questions; size it for I/O-bound waits.
+THREADPOOL_SIZE = int(os.getenv("API_THREADPOOL_SIZE", "100"))
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response rendered by pydantic-core's Rust serializer.
+
+    Faster than the stdlib encoder for row-heavy payloads, and handles the
+    Decimal/date/datetime values pyodbc returns without a Python fallback.
+    """
+
+    def render(self, content) -> bytes:
+        return to_json(content)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    anyio.to_thread.current_default_thread_limiter().total_tokens = THREADPOOL_SIZE
+    # Discover the schema before serving so the first question does not pay
+    # for it; if the database is unreachable, start anyway and retry lazily.
+    try:
+        await anyio.to_thread.run_sync(agent.warm_up)
+    except Exception as e:
+        logger.warning(f"Startup warm-up failed, continuing: {e}")
+    yield
+
+
 # -----------------------------------------------------------
 # FastAPI app
 # -----------------------------------------------------------
@@ -46,14 +87,23 @@ app = FastAPI(
     version="2.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=FastJSONResponse,
 )
 
-# CORS — allow Copilot Studio and browser testing
+# CORS — Copilot Studio calls the API server-side, so this only matters for
+# browser clients. CORS_ALLOW_ORIGINS is a comma-separated allowlist
+# (default "*" for testing). Auth is the X-API-Key header, not cookies, so
+# credentials are never needed and "*" is sent as-is instead of echoing
+# each request's Origin.
+CORS_ALLOW_ORIGINS = [
+    o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()
+]
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
+    allow_origins=CORS_ALLOW_ORIGINS,
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
 
@@ -109,7 +159,17 @@ class AskResponse(BaseModel):
         default_factory=list,
         description="Rows of data from the query result (max 50 rows).",
     )
-    row_count: int = Field(0, description="Total number of rows returned.")
+    row_count: int = Field(
+        0,
+        description=(
+            "Total number of rows returned. Capped at the server's row limit "
+            "(SQL_MAX_ROWS, default 10000); see truncated."
+        ),
+    )
+    truncated: bool = Field(
+        False,
+        description="True if the query returned more rows than the row limit and row_count is a lower bound.",
+    )
     error: Optional[str] = Field(
         None, description="Error message if the query failed."
     )
@@ -149,24 +209,77 @@ class HealthResponse(BaseModel):
     ),
     dependencies=[Depends(verify_api_key)],
 )
-async def ask_question(request: AskRequest):
+def ask_question(request: AskRequest):
     start = time.time()
 
     result = agent.process_question(request.question)
 
-    # Convert rows from tuples to lists for JSON serialization
-    rows = [list(row) for row in result.get("rows", [])]
+    # Row tuples serialize as JSON arrays as-is; only the first 50 are sent
+    rows = result.get("rows", [])
 
-    return AskResponse(
+    # The agent's output is trusted: build the model without validation and
+    # return it as a Response so FastAPI does not re-validate it against
+    # response_model (which is kept for the OpenAPI schema).
+    response = AskResponse.model_construct(
         question=result["question"],
         answer=result.get("answer"),
         sql=result.get("sql"),
         columns=result.get("columns", []),
-        rows=rows[:50],
+        rows=list(islice(rows, 50)),
         row_count=len(rows),
+        truncated=result.get("truncated", False),
         error=result.get("error"),
         elapsed_seconds=round(time.time() - start, 2),
     )
+    return FastJSONResponse(
+        response, headers={"X-Cache": "HIT" if result.get("cache_hit") else "MISS"}
+    )
+
+
+def _sse(event: dict) -> bytes:
+    """Frame one event as a Server-Sent Events data line."""
+    return b"data: " + to_json(event) + b"\n\n"
+
+
+@app.post(
+    "/api/ask/stream",
+    summary="Ask a question and stream the answer",
+    description=(
+        "Same pipeline as /api/ask, returned as Server-Sent Events so the "
+        "answer can be shown while it is generated. Each event is a JSON "
+        "object with a `type` of `sql`, `rows` (first 50 rows plus "
+        "`row_count` and `truncated`), `delta` (a piece of the answer text), `error`, or "
+        "a final `done` carrying `elapsed_seconds`."
+    ),
+    dependencies=[Depends(verify_api_key)],
+)
+def ask_question_stream(request: AskRequest):
+    start = time.time()
+
+    def events():
+        for event in agent.process_question_stream(request.question):
+            if event["type"] == "rows":
+                rows = event["rows"]
+                event = {
+                    "type": "rows",
+                    "columns": event["columns"],
+                    "rows": list(islice(rows, 50)),
+                    "row_count": len(rows),
+                    "truncated": event["truncated"],
+                }
+            yield _sse(event)
+        yield _sse({"type": "done", "elapsed_seconds": round(time.time() - start, 2)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+# (schema text it was built from, ETag, JSON body) for /api/schema
+_schema_response: tuple[str, str, bytes] | None = None
+SCHEMA_CACHE_CONTROL = "private, max-age=300"
 
 
 @app.get(
@@ -179,17 +292,32 @@ async def ask_question(request: AskRequest):
     ),
     dependencies=[Depends(verify_api_key)],
 )
-async def get_schema():
+def get_schema(request: Request):
+    global _schema_response
     try:
-        schema_text = agent.discover_schema()
-        table_count = schema_text.count("Table: ")
-        return SchemaResponse(
-            schema_text=schema_text,
-            table_count=table_count,
-        )
+        meta = agent.get_schema_meta()
+        schema_text = meta["schema_text"]
+        table_count = meta["table_count"]
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Schema discovery failed: {str(e)}")
 
+    # The agent returns the same cached schema string until the schema is
+    # reset, so the serialized body and its ETag are reused until then.
+    cached = _schema_response
+    if cached is None or cached[0] is not schema_text:
+        body = to_json(SchemaResponse.model_construct(
+            schema_text=schema_text,
+            table_count=table_count,
+        ))
+        etag = f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"'
+        cached = _schema_response = (schema_text, etag, body)
+
+    _, etag, body = cached
+    headers = {"ETag": etag, "Cache-Control": SCHEMA_CACHE_CONTROL}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
 
 @app.get(
     "/api/health",
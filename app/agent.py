@@ -8,44 +8,158 @@ Two-stage LLM pipeline with DYNAMIC schema discovery:
   3. synthesize_response() – Converts SQL results to natural language (temperature=0.3)
 
 Dependencies:
-  pip install openai pyodbc python-dotenv azure-identity
+  pip install openai pyodbc python-dotenv azure-identity numpy
 
 Environment variables (loaded from .env):
   AZURE_OPENAI_ENDPOINT, AZURE_OPENAI_DEPLOYMENT
   SQL_SERVER, SQL_DATABASE, SQL_USERNAME, SQL_PASSWORD, SQL_DRIVER
+  SQL_POOL_SIZE (default 8), SQL_POOL_IDLE_TIMEOUT (seconds, default 300)
+  SQL_MAX_ROWS (rows kept per query, default 10000; larger results are cut to
+    this many and flagged "truncated", so row counts never exceed it),
+  SQL_FETCH_BATCH (default 1000)
+  SQL_RESULT_CACHE_TTL (seconds query results are reused, default 60; 0 disables),
+  SQL_RESULT_CACHE_MAX_ROWS (larger results are not cached, default 1000)
+
+Optional semantic cache (disabled unless an embedding deployment is set):
+  AZURE_OPENAI_EMBEDDING_DEPLOYMENT (e.g. text-embedding-3-small)
+  SEMANTIC_CACHE_THRESHOLD (default 0.92), SEMANTIC_CACHE_TTL (seconds, default 3600),
+  SEMANTIC_CACHE_SIZE (default 512)
 
 Authentication:
   Uses DefaultAzureCredential (Managed Identity on VM, or az login locally).
   No API keys required.
 """
 
+import hashlib
 import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby, islice
+from operator import itemgetter
+from typing import Callable, Iterator, Optional
+
+import httpx
+import numpy as np
 import pyodbc
-from openai import AzureOpenAI
+from openai import AzureOpenAI, DefaultHttpxClient
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from dotenv import load_dotenv
 
 load_dotenv()
 
 # -----------------------------------------------------------
-# Schema cache (populated once on first request)
+# Configuration (read once at import)
+# -----------------------------------------------------------
+SQL_DATABASE = os.getenv("SQL_DATABASE")
+AZURE_OPENAI_ENDPOINT = os.getenv("AZURE_OPENAI_ENDPOINT")
+AZURE_OPENAI_DEPLOYMENT = os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o")
+OPENAI_KEEPALIVE_SEC = float(os.getenv("OPENAI_KEEPALIVE_SEC", "60"))
+
+_CONN_STR = (
+    f"DRIVER={os.getenv('SQL_DRIVER', '{ODBC Driver 18 for SQL Server}')};"
+    f"SERVER={os.getenv('SQL_SERVER')};"
+    f"DATABASE={SQL_DATABASE};"
+    f"UID={os.getenv('SQL_USERNAME')};"
+    f"PWD={os.getenv('SQL_PASSWORD')};"
+    "Encrypt=yes;"
+    "TrustServerCertificate=no;"
+    "Connection Timeout=30;"
+)
+
+# -----------------------------------------------------------
+# Schema + system prompt cache (populated once on first request)
 # -----------------------------------------------------------
 _schema_cache: str | None = None
+_schema_hash: str = ""
+_schema_meta: dict | None = None
+_system_prompt_cache: str | None = None
+
+# Exact-match cache of generated SQL: (schema hash, normalized question) -> SQL
+_SQL_CACHE_SIZE = 1024
+_sql_cache: OrderedDict[tuple[str, str], str] = OrderedDict()
+_sql_cache_lock = threading.Lock()
 
 
 def get_db_connection() -> pyodbc.Connection:
     """Establish a connection to Azure SQL Database."""
-    conn_str = (
-        f"DRIVER={os.getenv('SQL_DRIVER', '{ODBC Driver 18 for SQL Server}')};"
-        f"SERVER={os.getenv('SQL_SERVER')};"
-        f"DATABASE={os.getenv('SQL_DATABASE')};"
-        f"UID={os.getenv('SQL_USERNAME')};"
-        f"PWD={os.getenv('SQL_PASSWORD')};"
-        "Encrypt=yes;"
-        "TrustServerCertificate=no;"
-        "Connection Timeout=30;"
-    )
-    return pyodbc.connect(conn_str)
+    return pyodbc.connect(_CONN_STR)
+
+
+class ConnectionPool:
+    """
+    Bounded pool of reusable database connections.
+
+    At most ``size`` connections are open or handed out at once; callers
+    beyond that block until one is returned. Idle connections older than
+    ``idle_timeout`` seconds are closed instead of reused, and a connection
+    that raised a database error is discarded rather than returned.
+    """
+
+    def __init__(self, size: int, idle_timeout: float) -> None:
+        self.idle_timeout = idle_timeout
+        self._slots = threading.BoundedSemaphore(size)
+        self._idle: queue.LifoQueue[tuple[pyodbc.Connection, float]] = queue.LifoQueue()
+
+    def _checkout(self) -> pyodbc.Connection:
+        now = time.monotonic()
+        while True:
+            try:
+                conn, returned_at = self._idle.get_nowait()
+            except queue.Empty:
+                return get_db_connection()
+            if now - returned_at <= self.idle_timeout:
+                return conn
+            try:
+                conn.close()
+            except pyodbc.Error:
+                pass
+
+    @contextmanager
+    def acquire(self):
+        """Borrow a connection for the duration of a ``with`` block."""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                yield conn
+                # End any transaction the query opened before reuse; this
+                # also keeps the old behaviour of never committing writes.
+                conn.rollback()
+            except BaseException:
+                try:
+                    conn.close()
+                except pyodbc.Error:
+                    pass
+                raise
+            self._idle.put((conn, time.monotonic()))
+
+    def prefill(self) -> None:
+        """Open one idle connection ahead of time if none is waiting."""
+        if not self._idle.empty() or not self._slots.acquire(blocking=False):
+            return
+        try:
+            self._idle.put((get_db_connection(), time.monotonic()))
+        except pyodbc.Error:
+            pass  # best-effort; acquire() will surface the real error
+        finally:
+            self._slots.release()
+
+
+db_pool = ConnectionPool(
+    size=int(os.getenv("SQL_POOL_SIZE", "8")),
+    idle_timeout=float(os.getenv("SQL_POOL_IDLE_TIMEOUT", "300")),
+)
+
+# Background worker that opens a pooled connection while the LLM is busy
+_prefill_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sql-prefill")
+
+
+# Columns whose distinct values are listed in the schema prompt
+SAMPLE_VALUE_COLUMNS = [("Orders", "Status"), ("Products", "Category")]
 
 
 def discover_schema() -> str:
@@ -55,16 +169,17 @@ def discover_schema() -> str:
     from INFORMATION_SCHEMA and sys catalog views.
     Results are cached after first call.
     """
-    global _schema_cache
+    global _schema_cache, _schema_hash, _schema_meta
     if _schema_cache is not None:
         return _schema_cache
 
-    conn = get_db_connection()
-    try:
+    with db_pool.acquire() as conn:
         cursor = conn.cursor()
 
-        # 1. Get all user tables and their columns
+        # Catalog queries run as one batch (one round trip); each SELECT is
+        # a separate result set, read in order with nextset().
         cursor.execute("""
+            -- 1. All user tables and their columns
             SELECT
                 c.TABLE_NAME,
                 c.COLUMN_NAME,
@@ -80,12 +195,9 @@ def discover_schema() -> str:
                 AND c.TABLE_SCHEMA = t.TABLE_SCHEMA
             WHERE t.TABLE_TYPE = 'BASE TABLE'
                 AND t.TABLE_SCHEMA = 'dbo'
-            ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION
-        """)
-        columns_data = cursor.fetchall()
+            ORDER BY c.TABLE_NAME, c.ORDINAL_POSITION;
 
-        # 2. Get primary keys
-        cursor.execute("""
+            -- 2. Primary keys
             SELECT
                 kcu.TABLE_NAME,
                 kcu.COLUMN_NAME
@@ -93,12 +205,9 @@ def discover_schema() -> str:
             INNER JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE kcu
                 ON tc.CONSTRAINT_NAME = kcu.CONSTRAINT_NAME
             WHERE tc.CONSTRAINT_TYPE = 'PRIMARY KEY'
-                AND tc.TABLE_SCHEMA = 'dbo'
-        """)
-        pk_set = {(row[0], row[1]) for row in cursor.fetchall()}
+                AND tc.TABLE_SCHEMA = 'dbo';
 
-        # 3. Get foreign keys
-        cursor.execute("""
+            -- 3. Foreign keys
             SELECT
                 fk_col.TABLE_NAME AS FK_Table,
                 fk_col.COLUMN_NAME AS FK_Column,
@@ -109,34 +218,16 @@ def discover_schema() -> str:
                 ON rc.CONSTRAINT_NAME = fk_col.CONSTRAINT_NAME
             INNER JOIN INFORMATION_SCHEMA.KEY_COLUMN_USAGE pk_col
                 ON rc.UNIQUE_CONSTRAINT_NAME = pk_col.CONSTRAINT_NAME
-        """)
-        fk_list = cursor.fetchall()
+            ORDER BY fk_col.TABLE_NAME, fk_col.COLUMN_NAME;
 
-        # 4. Get computed columns
-        cursor.execute("""
+            -- 4. Computed columns
             SELECT
                 OBJECT_NAME(object_id) AS TableName,
                 name AS ColumnName,
                 definition AS Expression
-            FROM sys.computed_columns
-        """)
-        computed = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
-
-        # 5. Sample a few distinct values for key columns (helps LLM understand data)
-        sample_values = {}
-        for table_col in [("Orders", "Status"), ("Products", "Category")]:
-            try:
-                tbl, col = table_col
-                cursor.execute(f"SELECT DISTINCT [{col}] FROM dbo.[{tbl}]")
-                vals = [str(r[0]) for r in cursor.fetchall()]
-                if vals:
-                    sample_values[(tbl, col)] = vals
-            except Exception:
-                pass
+            FROM sys.computed_columns;
 
-        # 6. Get row counts
-        row_counts = {}
-        cursor.execute("""
+            -- 5. Row counts
             SELECT
                 t.name AS TableName,
                 SUM(p.rows) AS Cnt
@@ -144,25 +235,42 @@ def discover_schema() -> str:
             INNER JOIN sys.partitions p ON t.object_id = p.object_id
             WHERE p.index_id IN (0, 1)
                 AND t.schema_id = SCHEMA_ID('dbo')
-            GROUP BY t.name
+            GROUP BY t.name;
         """)
-        for row in cursor.fetchall():
-            row_counts[row[0]] = row[1]
+        columns_data = cursor.fetchall()
+        cursor.nextset()
+        pk_set = {(row[0], row[1]) for row in cursor.fetchall()}
+        cursor.nextset()
+        fk_list = cursor.fetchall()
+        cursor.nextset()
+        computed = {(row[0], row[1]): row[2] for row in cursor.fetchall()}
+        cursor.nextset()
+        row_counts = {row[0]: row[1] for row in cursor.fetchall()}
 
-    finally:
-        conn.close()
+        # 6. Sample a few distinct values for key columns (helps LLM understand data).
+        # Only columns that exist are sampled, all in one UNION ALL query.
+        existing = {(row[0], row[1]) for row in columns_data}
+        sample_cols = [tc for tc in SAMPLE_VALUE_COLUMNS if tc in existing]
+        sample_values = {}
+        if sample_cols:
+            sample_sql = "\nUNION ALL\n".join(
+                f"SELECT {i} AS Idx, CAST([{col}] AS NVARCHAR(4000)) AS Val "
+                f"FROM (SELECT DISTINCT [{col}] FROM dbo.[{tbl}]) AS d"
+                for i, (tbl, col) in enumerate(sample_cols)
+            )
+            try:
+                cursor.execute(sample_sql + "\nORDER BY Idx, Val")
+                for idx, val in cursor.fetchall():
+                    sample_values.setdefault(sample_cols[idx], []).append(str(val))
+            except Exception:
+                pass
 
     # Build schema string
-    db_name = os.getenv("SQL_DATABASE", "SalesDB")
+    db_name = SQL_DATABASE or "SalesDB"
     lines = [f"Database: {db_name}", ""]
 
-    # Group columns by table
-    tables: dict[str, list] = {}
-    for row in columns_data:
-        tbl = row[0]
-        if tbl not in tables:
-            tables[tbl] = []
-        tables[tbl].append(row)
+    # Group columns by table (rows arrive ordered by table name)
+    tables = {tbl: list(cols) for tbl, cols in groupby(columns_data, key=itemgetter(0))}
 
     relationships = []
 
@@ -212,14 +320,47 @@ def discover_schema() -> str:
         lines.append("")
 
     schema_str = "\n".join(lines)
+    _schema_hash = hashlib.blake2b(schema_str.encode(), digest_size=8).hexdigest()
+    _schema_meta = {
+        "schema_text": schema_str,
+        "table_count": len(tables),
+        "relationships": relationships,
+    }
     _schema_cache = schema_str
     return schema_str
 
 
+def get_schema_meta() -> dict:
+    """
+    Return the cached schema with facts gathered while building it.
+
+    Keys: schema_text, table_count, relationships (list of "A.x -> B.y").
+    """
+    # Read the global once: reset_schema_cache() may clear it between
+    # discover_schema() returning and the caller using the result.
+    meta = _schema_meta
+    while meta is None:
+        discover_schema()
+        meta = _schema_meta
+    return meta
+
+
 def get_system_prompt() -> str:
-    """Build the system prompt with dynamically discovered schema."""
+    """
+    Build the system prompt with dynamically discovered schema.
+    The prompt is built once and cached alongside the schema.
+
+    The prompt is the large, static prefix of every generate_sql call, so it
+    must stay byte-identical across calls and processes (no timestamps, every
+    schema query ordered): Azure OpenAI then serves it from its automatic
+    prompt cache instead of reprocessing the schema on each request.
+    """
+    global _system_prompt_cache
+    if _system_prompt_cache is not None:
+        return _system_prompt_cache
+
     schema = discover_schema()
-    return f"""You are an expert SQL query generator for Microsoft SQL Server (Azure SQL).
+    _system_prompt_cache = f"""You are an expert SQL query generator for Microsoft SQL Server (Azure SQL).
 Given a natural language question, generate ONLY the T-SQL query — no explanations, no markdown.
 
 Rules:
@@ -234,6 +375,7 @@ Rules:
 Schema:
 {schema}
 """
+    return _system_prompt_cache
 
 
 SYNTHESIS_PROMPT = """You are a helpful data analyst assistant.
@@ -249,24 +391,60 @@ Rules:
 """
 
 
+# Shared Azure OpenAI client: the credential chain, token cache and HTTP
+# keep-alive pool are set up once and reused by every request.
+_openai_client: AzureOpenAI | None = None
+_openai_client_lock = threading.Lock()
+
+
 def get_openai_client() -> AzureOpenAI:
-    """Create an Azure OpenAI client using Entra ID (Managed Identity)."""
-    credential = DefaultAzureCredential()
-    token_provider = get_bearer_token_provider(
-        credential, "https://cognitiveservices.azure.com/.default"
-    )
-    return AzureOpenAI(
-        azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
-        azure_ad_token_provider=token_provider,
-        api_version="2024-08-01-preview",
-    )
+    """Return the shared Azure OpenAI client using Entra ID (Managed Identity)."""
+    global _openai_client
+    if _openai_client is None:
+        with _openai_client_lock:
+            if _openai_client is None:
+                credential = DefaultAzureCredential()
+                token_provider = get_bearer_token_provider(
+                    credential, "https://cognitiveservices.azure.com/.default"
+                )
+                token_provider()  # fetch the first token now, not mid-request
+                _openai_client = AzureOpenAI(
+                    azure_endpoint=AZURE_OPENAI_ENDPOINT,
+                    azure_ad_token_provider=token_provider,
+                    api_version="2024-08-01-preview",
+                    http_client=DefaultHttpxClient(
+                        limits=httpx.Limits(
+                            max_keepalive_connections=50,
+                            max_connections=100,
+                            # httpx drops idle connections after 5s by default;
+                            # keep them for bursty MCP / Copilot traffic.
+                            keepalive_expiry=OPENAI_KEEPALIVE_SEC,
+                        )
+                    ),
+                )
+    return _openai_client
+
+
+# Any line opening or closing a markdown code fence (``` or ```sql)
+_FENCE_LINE_RE = re.compile(r"^```.*(?:\n|\Z)", re.MULTILINE)
 
 
 def generate_sql(client: AzureOpenAI, question: str) -> str:
-    """Stage 1: Convert natural language question to T-SQL."""
+    """
+    Stage 1: Convert natural language question to T-SQL.
+    Repeats of a question (ignoring case and whitespace) against the same
+    schema are answered from an in-memory LRU cache without calling the LLM.
+    """
     system_prompt = get_system_prompt()
+    key = (_schema_hash, " ".join(question.lower().split()))
+    with _sql_cache_lock:
+        sql = _sql_cache.get(key)
+        if sql is not None:
+            _sql_cache.move_to_end(key)
+            return sql
+
     response = client.chat.completions.create(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o"),
+        model=AZURE_OPENAI_DEPLOYMENT,
         messages=[
             {"role": "system", "content": system_prompt},
             {"role": "user", "content": question},
@@ -278,94 +456,407 @@ def generate_sql(client: AzureOpenAI, question: str) -> str:
 
     # Strip markdown code fences if the model includes them
     if sql.startswith("```"):
-        lines = sql.split("\n")
-        lines = [l for l in lines if not l.startswith("```")]
-        sql = "\n".join(lines).strip()
+        sql = _FENCE_LINE_RE.sub("", sql).strip()
 
+    with _sql_cache_lock:
+        _sql_cache[key] = sql
+        if len(_sql_cache) > _SQL_CACHE_SIZE:
+            _sql_cache.popitem(last=False)
     return sql
 
 
-def execute_sql(sql: str) -> tuple[list[str], list[tuple]]:
-    """Execute a SQL query and return (columns, rows)."""
-    conn = get_db_connection()
-    try:
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        columns = [desc[0] for desc in cursor.description] if cursor.description else []
-        rows = cursor.fetchall()
-        return columns, [tuple(row) for row in rows]
-    finally:
-        conn.close()
+# -----------------------------------------------------------
+# Read-only guard for SQL before it reaches the database
+# -----------------------------------------------------------
+# String literals, quoted/bracketed identifiers and comments are masked out
+# first so keywords inside them are not mistaken for statements.
+_SQL_MASK_RE = re.compile(
+    r"'(?:[^']|'')*'|\[(?:[^\]]|\]\])*\]|\"(?:[^\"]|\"\")*\"|--[^\n]*|/\*.*?\*/",
+    re.DOTALL,
+)
+_SQL_WRITE_KEYWORDS = frozenset({
+    "INSERT", "UPDATE", "DELETE", "MERGE", "INTO", "DROP", "ALTER", "CREATE",
+    "TRUNCATE", "GRANT", "REVOKE", "DENY", "BACKUP", "RESTORE", "DBCC", "KILL",
+    "OPENROWSET", "OPENDATASOURCE", "OPENQUERY",
+})
+# Never part of a SELECT: rejected wherever they appear (EXECUTE AS ... too)
+_SQL_EXEC_KEYWORDS = frozenset({"EXEC", "EXECUTE"})
+# Keywords that can only start a statement of their own, some with no
+# arguments at all (SELECT 1 COMMIT). Session state they change (SET
+# options, EXECUTE AS, USE) would also outlive the query on a pooled
+# connection, so they are rejected unless they sit where an identifier goes.
+_SQL_STATEMENT_KEYWORDS = frozenset({
+    "SET", "DECLARE", "BEGIN", "COMMIT", "ROLLBACK", "SAVE", "REVERT", "USE",
+    "WAITFOR", "SHUTDOWN", "RECONFIGURE", "CHECKPOINT", "PRINT", "RAISERROR",
+    "THROW", "IF", "WHILE", "GOTO", "RETURN", "DEALLOCATE",
+})
+# A keyword right after one of these is an operand (column, table, alias)...
+_SQL_OPERAND_BEFORE = frozenset({
+    ".", ",", "(", "=", "<", ">", "+", "-", "/", "%",
+    "AS", "SELECT", "DISTINCT", "FROM", "JOIN", "APPLY", "ON", "WHERE", "AND", "OR",
+    "NOT", "BY", "HAVING", "CASE", "WHEN", "THEN", "ELSE", "IN", "IS", "LIKE", "BETWEEN",
+})
+# ...and so is one followed by one of these (or by the end of the query).
+_SQL_OPERAND_AFTER = frozenset({
+    ".", ",", ")", "=", "<", ">", "!", "+", "-", "*", "/", "%",
+    "AS", "FROM", "WHERE", "ORDER", "GROUP", "HAVING", "UNION", "EXCEPT", "INTERSECT",
+    "JOIN", "INNER", "LEFT", "RIGHT", "FULL", "CROSS", "OUTER", "ON", "AND", "OR",
+    "IS", "IN", "NOT", "LIKE", "BETWEEN", "WHEN", "THEN", "ELSE", "END", "ASC", "DESC",
+    "OPTION", "FOR", "",
+})
+_SQL_TOKEN_RE = re.compile(r"[A-Za-z_@#][\w@#$]*|\d+(?:\.\d+)?|\S")
+
+
+def _mask_sql_token(match: re.Match) -> str:
+    # Comments vanish; literals and identifiers become a neutral token
+    return " " if match.group(0)[0] in "-/" else " 0 "
+
+
+def _find_write_keyword(tokens: list[str]) -> Optional[str]:
+    """
+    Return the first write keyword in statement position among the
+    (upper-cased) tokens of a masked query, if any.
+
+    T-SQL does not need a separator between statements ("SELECT 1 DROP
+    TABLE t" is two), so keywords are looked for throughout the query, but
+    one that sits where a column, table or alias goes (SELECT Backup FROM
+    t, t.Kill, ... FROM Restore WHERE ...) is taken as an identifier.
+    EXEC/EXECUTE are never identifiers, and statement-only keywords (SET,
+    BEGIN, ...) only are when the previous token expects an operand.
+    """
+    for i, token in enumerate(tokens):
+        if token in _SQL_EXEC_KEYWORDS:
+            return token
+        statement = token in _SQL_STATEMENT_KEYWORDS
+        if not statement and token not in _SQL_WRITE_KEYWORDS:
+            continue
+        before = tokens[i - 1] if i else ""
+        after = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if token.startswith("OPEN") and after == "(":
+            return token  # remote rowset call, valid wherever a table is
+        if before in _SQL_OPERAND_BEFORE:
+            continue
+        if (
+            not statement
+            and after in _SQL_OPERAND_AFTER
+            and not (token == "DELETE" and after == "FROM")
+        ):
+            continue
+        return token
+    return None
+
+
+def check_read_only(sql: str) -> str:
+    """
+    Return sql without leading/trailing semicolons if it is a single SELECT
+    (optionally with a WITH prefix, or parenthesized) that does not modify
+    anything; otherwise raise ValueError without touching the database.
+    """
+    sql = sql.strip().strip(";").strip()
+    masked = _SQL_MASK_RE.sub(_mask_sql_token, sql).strip("; \t\r\n")
+    if ";" in masked:
+        raise ValueError("Only a single SQL statement can be run.")
+    tokens = [t.upper() for t in _SQL_TOKEN_RE.findall(masked)]
+    first = next((t for t in tokens if t != "("), "")
+    if first not in ("SELECT", "WITH"):
+        raise ValueError("Only SELECT queries can be run.")
+    keyword = _find_write_keyword(tokens)
+    if keyword:
+        raise ValueError(f"Only read-only SELECT queries can be run (found {keyword}).")
+    return sql
 
 
-def synthesize_response(
-    client: AzureOpenAI,
+# Rows are fetched in batches up to a hard cap, so a generated query that
+# forgets TOP cannot pull a whole table into memory. Larger batches mean
+# fewer driver round trips on big results.
+SQL_FETCH_BATCH = int(os.getenv("SQL_FETCH_BATCH", "1000"))
+SQL_MAX_ROWS = int(os.getenv("SQL_MAX_ROWS", "10000"))
+
+
+def iter_rows(cursor: pyodbc.Cursor, batch: int = SQL_FETCH_BATCH) -> Iterator[tuple]:
+    """Yield result rows as tuples, fetching ``batch`` rows at a time."""
+    while rows := cursor.fetchmany(batch):
+        for row in rows:
+            yield tuple(row)
+
+
+def execute_sql(sql: str) -> tuple[list[str], list[tuple], bool]:
+    """
+    Execute a SQL query and return (columns, rows, truncated).
+
+    At most SQL_MAX_ROWS rows are kept; ``truncated`` is True when the query
+    produced more, so callers can say the row count is a lower bound.
+    Raises ValueError for anything but a single read-only SELECT.
+    """
+    sql = check_read_only(sql)
+    with db_pool.acquire() as conn:
+        cursor = conn.cursor()
+        cursor.execute(sql)
+        if not cursor.description:
+            return [], [], False
+        columns = [desc[0] for desc in cursor.description]
+        # One extra row tells a result of exactly SQL_MAX_ROWS from a cut one
+        rows = list(islice(iter_rows(cursor), SQL_MAX_ROWS + 1))
+    truncated = len(rows) > SQL_MAX_ROWS
+    if truncated:
+        del rows[SQL_MAX_ROWS:]
+    return columns, rows, truncated
+
+
+# Short-lived cache of query results: (schema hash, SQL) ->
+# (expires_at, columns, rows, truncated). Different questions often produce the same
+# SQL, and repeats within the TTL skip the database entirely.
+#
+# Entries are kept in insertion order, which is also expiry order (hits do
+# not reorder), so every insert drops expired entries from the front. Only
+# results of at most SQL_RESULT_CACHE_MAX_ROWS rows (and never truncated
+# ones) are cached, so the cache holds at most _RESULT_CACHE_SIZE times
+# that many rows, and only for the TTL.
+SQL_RESULT_CACHE_TTL = float(os.getenv("SQL_RESULT_CACHE_TTL", "60"))
+SQL_RESULT_CACHE_MAX_ROWS = int(os.getenv("SQL_RESULT_CACHE_MAX_ROWS", "1000"))
+_RESULT_CACHE_SIZE = 256
+_result_cache: OrderedDict[tuple[str, str], tuple[float, list[str], list[tuple], bool]] = OrderedDict()
+_result_cache_lock = threading.Lock()
+
+
+def execute_sql_cached(sql: str) -> tuple[list[str], list[tuple], bool, bool]:
+    """Like execute_sql, but serve repeats from the result cache; returns (columns, rows, truncated, hit)."""
+    sql = check_read_only(sql)
+    key = (_schema_hash, sql)
+    now = time.monotonic()
+    with _result_cache_lock:
+        entry = _result_cache.get(key)
+        if entry is not None:
+            if entry[0] > now:
+                return entry[1], entry[2], entry[3], True
+            del _result_cache[key]
+
+    columns, rows, truncated = execute_sql(sql)
+    if SQL_RESULT_CACHE_TTL > 0 and not truncated and len(rows) <= SQL_RESULT_CACHE_MAX_ROWS:
+        with _result_cache_lock:
+            now = time.monotonic()
+            while _result_cache and next(iter(_result_cache.values()))[0] <= now:
+                _result_cache.popitem(last=False)
+            _result_cache.pop(key, None)  # re-insert at the back, in expiry order
+            _result_cache[key] = (now + SQL_RESULT_CACHE_TTL, columns, rows, truncated)
+            if len(_result_cache) > _RESULT_CACHE_SIZE:
+                _result_cache.popitem(last=False)
+    return columns, rows, truncated, False
+
+
+def _synthesis_messages(
     question: str,
     sql: str,
     columns: list[str],
     rows: list[tuple],
-) -> str:
-    """Stage 2: Convert SQL results to natural language answer."""
+    truncated: bool = False,
+) -> list[dict]:
+    """Build the chat messages for the synthesis stage."""
     if rows:
-        result_str = " | ".join(columns) + "\n"
-        result_str += "-" * len(result_str) + "\n"
-        for row in rows[:50]:
-            result_str += " | ".join(str(v) for v in row) + "\n"
+        header = " | ".join(columns)
+        lines = [header, "-" * (len(header) + 1)]
+        lines.extend(" | ".join(map(str, row)) for row in islice(rows, 50))
+        lines.append("")
         if len(rows) > 50:
-            result_str += f"\n... and {len(rows) - 50} more rows."
+            lines.append(f"... and {len(rows) - 50} more rows.")
+        result_str = "\n".join(lines)
     else:
         result_str = "(No results returned)"
 
+    if truncated:
+        count = f"first {len(rows)} rows; the query returned more, so totals are incomplete"
+    else:
+        count = f"{len(rows)} rows"
     user_msg = (
         f"User question: {question}\n\n"
         f"SQL query executed:\n{sql}\n\n"
-        f"Results ({len(rows)} rows):\n{result_str}"
+        f"Results ({count}):\n{result_str}"
     )
+    return [
+        {"role": "system", "content": SYNTHESIS_PROMPT},
+        {"role": "user", "content": user_msg},
+    ]
 
+
+def synthesize_response(
+    client: AzureOpenAI,
+    question: str,
+    sql: str,
+    columns: list[str],
+    rows: list[tuple],
+    truncated: bool = False,
+) -> str:
+    """Stage 2: Convert SQL results to natural language answer."""
     response = client.chat.completions.create(
-        model=os.getenv("AZURE_OPENAI_DEPLOYMENT", "gpt-4o"),
-        messages=[
-            {"role": "system", "content": SYNTHESIS_PROMPT},
-            {"role": "user", "content": user_msg},
-        ],
+        model=AZURE_OPENAI_DEPLOYMENT,
+        messages=_synthesis_messages(question, sql, columns, rows, truncated),
         temperature=0.3,
         max_tokens=800,
     )
     return response.choices[0].message.content.strip()
 
 
-def process_question(question: str) -> dict:
+def stream_synthesis(
+    client: AzureOpenAI,
+    question: str,
+    sql: str,
+    columns: list[str],
+    rows: list[tuple],
+    truncated: bool = False,
+) -> Iterator[str]:
+    """Like synthesize_response, but yield the answer as text deltas."""
+    stream = client.chat.completions.create(
+        model=AZURE_OPENAI_DEPLOYMENT,
+        messages=_synthesis_messages(question, sql, columns, rows, truncated),
+        temperature=0.3,
+        max_tokens=800,
+        stream=True,
+    )
+    for chunk in stream:
+        # Azure sends a leading chunk with no choices (content filter results)
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
+# -----------------------------------------------------------
+# Semantic cache (question embedding -> pipeline result)
+# -----------------------------------------------------------
+class SemanticCache:
+    """
+    In-memory cache of pipeline results keyed by question embedding.
+
+    A lookup hits when a stored question's embedding has cosine similarity
+    >= threshold with the new one and the entry is younger than ttl
+    seconds, so paraphrased questions skip both LLM calls and the database.
+    Oldest entries are dropped beyond max_entries.
+    """
+
+    def __init__(self, threshold: float, ttl: float, max_entries: int) -> None:
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._vectors: np.ndarray | None = None  # (n, dim), unit-normalized
+        self._created: list[float] = []
+        self._results: list[dict] = []
+
+    def lookup(self, embedding: np.ndarray) -> dict | None:
+        """Return the cached result closest to embedding, or None."""
+        with self._lock:
+            if self._vectors is None:
+                return None
+            vectors, created, results = self._vectors, self._created, self._results
+        scores = vectors @ embedding
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold or time.monotonic() - created[best] > self.ttl:
+            return None
+        return results[best]
+
+    def add(self, embedding: np.ndarray, result: dict) -> None:
+        """Store a result, dropping expired entries and the oldest beyond max_entries."""
+        now = time.monotonic()
+        with self._lock:
+            keep = [i for i, t in enumerate(self._created) if now - t <= self.ttl]
+            keep = keep[max(0, len(keep) - self.max_entries + 1):]
+            kept_vectors = [self._vectors[keep]] if keep else []
+            self._vectors = np.vstack([*kept_vectors, embedding[np.newaxis, :]])
+            self._created = [self._created[i] for i in keep] + [now]
+            self._results = [self._results[i] for i in keep] + [result]
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        with self._lock:
+            self._vectors = None
+            self._created = []
+            self._results = []
+
+
+EMBEDDING_DEPLOYMENT = os.getenv("AZURE_OPENAI_EMBEDDING_DEPLOYMENT", "")
+semantic_cache = SemanticCache(
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92")),
+    ttl=float(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
+)
+
+
+def embed_question(client: AzureOpenAI, question: str) -> np.ndarray:
+    """Embed a question as a unit-length vector."""
+    response = client.embeddings.create(model=EMBEDDING_DEPLOYMENT, input=question)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def _semantic_lookup(
+    client: AzureOpenAI, question: str
+) -> tuple[Optional[np.ndarray], Optional[dict]]:
+    """Return (embedding, cached result) for question; either may be None."""
+    if not EMBEDDING_DEPLOYMENT:
+        return None, None
+    try:
+        embedding = embed_question(client, question)
+    except Exception:
+        return None, None  # cache is best-effort; run the full pipeline
+    return embedding, semantic_cache.lookup(embedding)
+
+
+def process_question(
+    question: str, on_progress: Optional[Callable[[str], None]] = None
+) -> dict:
     """
     End-to-end pipeline: question -> SQL -> execute -> synthesise -> answer.
 
+    on_progress, if given, is called with a short status message as each
+    stage finishes (from the calling thread).
+
     Returns:
-        dict with keys: question, sql, columns, rows, answer, error
+        dict with keys: question, sql, columns, rows, truncated (True if
+        rows were cut at SQL_MAX_ROWS), answer, error, cache_hit (True if
+        the answer or rows came from a cache)
     """
     result = {
         "question": question,
         "sql": None,
         "columns": [],
         "rows": [],
+        "truncated": False,
         "answer": None,
         "error": None,
+        "cache_hit": False,
     }
 
     try:
         client = get_openai_client()
 
+        # Semantic cache: reuse the result of a sufficiently similar question
+        embedding, cached = _semantic_lookup(client, question)
+        if cached is not None:
+            return {**cached, "question": question, "cache_hit": True}
+
+        # Warm a DB connection under the LLM call so Stage 2 skips the login
+        _prefill_executor.submit(db_pool.prefill)
+
         # Stage 1: Generate SQL
         sql = generate_sql(client, question)
         result["sql"] = sql
+        if on_progress:
+            on_progress("SQL generated, running query")
 
-        # Stage 2: Execute SQL
-        columns, rows = execute_sql(sql)
+        # Stage 2: Execute SQL (repeats within a short TTL skip the database)
+        columns, rows, truncated, hit = execute_sql_cached(sql)
         result["columns"] = columns
         result["rows"] = rows
+        result["truncated"] = truncated
+        result["cache_hit"] = hit
+        if on_progress:
+            on_progress(f"Query returned {len(rows)} rows, writing answer")
 
         # Stage 3: Synthesise natural language answer
-        answer = synthesize_response(client, question, sql, columns, rows)
+        answer = synthesize_response(client, question, sql, columns, rows, truncated)
         result["answer"] = answer
 
+        if embedding is not None:
+            semantic_cache.add(embedding, dict(result))
+
     except pyodbc.Error as e:
         result["error"] = f"Database error: {str(e)}"
     except Exception as e:
@@ -374,10 +865,87 @@ def process_question(question: str) -> dict:
     return result
 
 
+def process_question_stream(question: str) -> Iterator[dict]:
+    """
+    Streaming variant of process_question.
+
+    Yields events as each stage finishes:
+      {"type": "sql", "sql": ...}
+      {"type": "rows", "columns": [...], "rows": [...], "truncated": bool}
+      {"type": "delta", "delta": ...}     (repeated, answer text)
+      {"type": "error", "error": ...}     (terminal, on failure)
+    """
+    try:
+        client = get_openai_client()
+
+        embedding, cached = _semantic_lookup(client, question)
+        if cached is not None:
+            yield {"type": "sql", "sql": cached["sql"]}
+            yield {
+                "type": "rows",
+                "columns": cached["columns"],
+                "rows": cached["rows"],
+                "truncated": cached.get("truncated", False),
+            }
+            yield {"type": "delta", "delta": cached["answer"]}
+            return
+
+        _prefill_executor.submit(db_pool.prefill)
+
+        sql = generate_sql(client, question)
+        yield {"type": "sql", "sql": sql}
+
+        columns, rows, truncated, _ = execute_sql_cached(sql)
+        yield {"type": "rows", "columns": columns, "rows": rows, "truncated": truncated}
+
+        parts = []
+        for delta in stream_synthesis(client, question, sql, columns, rows, truncated):
+            parts.append(delta)
+            yield {"type": "delta", "delta": delta}
+
+        if embedding is not None:
+            semantic_cache.add(embedding, {
+                "question": question,
+                "sql": sql,
+                "columns": columns,
+                "rows": rows,
+                "truncated": truncated,
+                "answer": "".join(parts).strip(),
+                "error": None,
+                "cache_hit": False,
+            })
+
+    except pyodbc.Error as e:
+        yield {"type": "error", "error": f"Database error: {str(e)}"}
+    except Exception as e:
+        yield {"type": "error", "error": f"Error: {str(e)}"}
+
+
+def warm_up() -> None:
+    """
+    Do the one-off work of the first request ahead of time.
+
+    Discovers and caches the schema, builds the system prompt, leaves an
+    open connection in the pool, and creates the OpenAI client (including
+    its first Entra ID token). Meant to be called at service startup.
+    """
+    discover_schema()
+    get_system_prompt()
+    db_pool.prefill()
+    get_openai_client()
+
+
 def reset_schema_cache():
-    """Clear the cached schema (useful if tables change)."""
-    global _schema_cache
+    """Clear the cached schema, prompt, generated SQL, query results and answers (useful if tables change)."""
+    global _schema_cache, _schema_meta, _system_prompt_cache
     _schema_cache = None
+    _schema_meta = None
+    _system_prompt_cache = None
+    with _sql_cache_lock:
+        _sql_cache.clear()
+    with _result_cache_lock:
+        _result_cache.clear()
+    semantic_cache.clear()
 
 
 # -----------------------------------------------------------
@@ -402,5 +970,6 @@ if __name__ == "__main__":
         print(f"Error: {res['error']}")
     else:
         print(f"SQL:\n{res['sql']}\n")
-        print(f"Results: {len(res['rows'])} rows")
+        more = " (truncated at SQL_MAX_ROWS)" if res["truncated"] else ""
+        print(f"Results: {len(res['rows'])} rows{more}")
         print(f"\nAnswer:\n{res['answer']}")
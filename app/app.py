@@ -13,6 +13,72 @@ import streamlit as st
 import pandas as pd
 from agent import process_question
 
+# -----------------------------------------------------------
+# Answer cache (survives Streamlit reruns and is shared across sessions)
+# -----------------------------------------------------------
+class _UncachedResult(Exception):
+    """Carries a failed result out of the cached function so it is not stored."""
+
+    def __init__(self, result: dict):
+        super().__init__(result["error"])
+        self.result = result
+
+
+@st.cache_data(ttl=3600, max_entries=256, show_spinner=False)
+def _cached_process(question: str) -> dict:
+    result = process_question(question)
+    if result["error"]:
+        raise _UncachedResult(result)
+    return result
+
+
+def ask(question: str) -> dict:
+    """Answer a question, reusing the cached result of an identical one."""
+    try:
+        return _cached_process(question)
+    except _UncachedResult as e:
+        return e.result
+
+
+# -----------------------------------------------------------
+# Result tables
+# -----------------------------------------------------------
+PAGE_SIZE = 1000  # rows sent to the browser at a time
+
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def _build_df(columns: tuple, rows: list) -> pd.DataFrame:
+    return pd.DataFrame(rows, columns=list(columns))
+
+
+def _rows_label(rows: list, truncated: bool) -> str:
+    """Row count for the results expander; truncated results show the row limit was hit."""
+    if truncated:
+        return f"first {len(rows)} rows — result truncated"
+    return f"{len(rows)} rows"
+
+
+@st.fragment
+def show_results(columns: list, rows: list, key: str) -> None:
+    """
+    Render query results, one page of PAGE_SIZE rows at a time.
+
+    Runs as a fragment, so changing page reruns only this table. The
+    DataFrame is kept in session state per message, so reruns of the chat
+    history reuse it instead of rebuilding (or re-hashing) the rows.
+    """
+    df = st.session_state.get(f"df_{key}")
+    if df is None:
+        df = st.session_state[f"df_{key}"] = _build_df(tuple(columns), rows)
+    if len(df) > PAGE_SIZE:
+        pages = (len(df) + PAGE_SIZE - 1) // PAGE_SIZE
+        page = st.number_input(
+            f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"page_{key}"
+        )
+        start = (page - 1) * PAGE_SIZE
+        df = df.iloc[start:start + PAGE_SIZE]
+    st.dataframe(df, use_container_width=True)
+
 # -----------------------------------------------------------
 # Page configuration
 # -----------------------------------------------------------
@@ -63,6 +129,9 @@ with st.sidebar:
             st.session_state["pending_question"] = q
 
     st.markdown("---")
+    if st.button("🗑️ Clear cached answers", use_container_width=True):
+        _cached_process.clear()
+        st.toast("Cached answers cleared")
     st.caption("Powered by Azure AI Foundry + Azure SQL")
 
 # -----------------------------------------------------------
@@ -72,7 +141,7 @@ if "messages" not in st.session_state:
     st.session_state.messages = []
 
 # Display existing chat messages
-for msg in st.session_state.messages:
+for i, msg in enumerate(st.session_state.messages):
     with st.chat_message(msg["role"]):
         st.markdown(msg["content"])
 
@@ -82,9 +151,8 @@ for msg in st.session_state.messages:
                 with st.expander("🔍 Generated SQL"):
                     st.code(msg["sql"], language="sql")
             if msg.get("columns") and msg.get("rows"):
-                with st.expander(f"📊 Query Results ({len(msg['rows'])} rows)"):
-                    df = pd.DataFrame(msg["rows"], columns=msg["columns"])
-                    st.dataframe(df, use_container_width=True)
+                with st.expander(f"📊 Query Results ({_rows_label(msg['rows'], msg.get('truncated'))})"):
+                    show_results(msg["columns"], msg["rows"], key=str(i))
 
 # -----------------------------------------------------------
 # Handle input
@@ -102,7 +170,7 @@ if user_input:
     # Process with AI agent
     with st.chat_message("assistant"):
         with st.spinner("Thinking... 🧠"):
-            result = process_question(user_input)
+            result = ask(user_input)
 
         if result["error"]:
             st.error(f"⚠️ {result['error']}")
@@ -121,9 +189,12 @@ if user_input:
 
             # Display results in expander
             if result["columns"] and result["rows"]:
-                with st.expander(f"📊 Query Results ({len(result['rows'])} rows)"):
-                    df = pd.DataFrame(result["rows"], columns=result["columns"])
-                    st.dataframe(df, use_container_width=True)
+                with st.expander(f"📊 Query Results ({_rows_label(result['rows'], result.get('truncated'))})"):
+                    show_results(
+                        result["columns"],
+                        result["rows"],
+                        key=str(len(st.session_state.messages)),
+                    )
 
             assistant_msg = {
                 "role": "assistant",
@@ -131,6 +202,7 @@ if user_input:
                 "sql": result["sql"],
                 "columns": result["columns"],
                 "rows": result["rows"],
+                "truncated": result.get("truncated", False),
             }
 
         st.session_state.messages.append(assistant_msg)
@@ -140,7 +140,7 @@ Type=simple
 User=azureuser
 WorkingDirectory=/home/azureuser/text2sql
 EnvironmentFile=/home/azureuser/text2sql/.env
-ExecStart=/home/azureuser/text2sql/venv/bin/python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --timeout-keep-alive 120
+ExecStart=/home/azureuser/text2sql/venv/bin/python3 -m uvicorn main:app --host 0.0.0.0 --port 8000 --timeout-keep-alive 120 --loop uvloop --http httptools
 Restart=always
 RestartSec=5
 
@@ -194,7 +194,7 @@ Type=simple
 User=azureuser
 WorkingDirectory=/home/azureuser/text2sql/a2a
 EnvironmentFile=/home/azureuser/text2sql/.env
-ExecStart=/home/azureuser/text2sql/venv/bin/python3 -m uvicorn server:app --host 0.0.0.0 --port 8002 --timeout-keep-alive 120
+ExecStart=/home/azureuser/text2sql/venv/bin/python3 -m uvicorn server:app --host 0.0.0.0 --port 8002 --loop uvloop --http httptools --timeout-keep-alive 120
 Restart=always
 RestartSec=5
 
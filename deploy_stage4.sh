@@ -61,11 +61,12 @@ echo ""
 # -----------------------------------------------------------
 # Phase 2: Upload MCP server.py to VM
 # -----------------------------------------------------------
-echo "[2/7] Uploading MCP server.py to VM..."
+echo "[2/7] Uploading MCP server.py and formatting.py to VM..."
 
-# Read the server.py file and upload it
+# Read the server files and upload them
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
 SERVER_PY=$(cat "$SCRIPT_DIR/mcp_server/server.py")
+FORMATTING_PY=$(cat "$SCRIPT_DIR/mcp_server/formatting.py")
 
 az vm run-command invoke \
     --resource-group "$RG_WORKSHOP" \
@@ -76,11 +77,14 @@ mkdir -p /home/azureuser/text2sql/mcp_server
 cat > /home/azureuser/text2sql/mcp_server/server.py << 'PYEOF'
 ${SERVER_PY}
 PYEOF
+cat > /home/azureuser/text2sql/mcp_server/formatting.py << 'PYEOF'
+${FORMATTING_PY}
+PYEOF
 chown -R azureuser:azureuser /home/azureuser/text2sql/mcp_server
 echo \"Uploaded server.py: \$(wc -l < /home/azureuser/text2sql/mcp_server/server.py) lines\"
 " --output none 2>/dev/null
 
-echo "  server.py uploaded."
+echo "  server.py and formatting.py uploaded."
 echo ""
 
 # -----------------------------------------------------------
@@ -119,10 +123,14 @@ az vm run-command invoke \
     --scripts '#!/bin/bash
 cd /home/azureuser/text2sql
 . venv/bin/activate
-pip install --quiet "mcp[cli]>=1.5.0" cryptography 2>&1 | tail -5
+pip install --quiet "mcp[cli]>=1.5.0" "uvicorn[standard]" cryptography 2>&1 | tail -5
 echo "Verify:"
 python3 -c "import mcp; print(f\"mcp {mcp.__version__ if hasattr(mcp, '\''__version__'\'') else '\''OK'\''}\")"
 python3 -c "from mcp.server.fastmcp import FastMCP; print(\"FastMCP import OK\")"
+# Optional: compile the result formatter with mypyc (pure Python is used if this fails)
+pip install --quiet mypy 2>&1 | tail -2
+(cd mcp_server && rm -f formatting.*.so && mypyc formatting.py >/dev/null 2>&1 && chown azureuser:azureuser formatting.*.so && echo "formatting.py compiled with mypyc") \
+    || echo "mypyc build skipped - using pure-Python formatting.py"
 echo "Install complete."
 ' --output none 2>/dev/null
 
@@ -0,0 +1,80 @@
+"""
+formatting.py — Result-table formatting for the MCP server
+===========================================================
+
+Turns (columns, rows) from agent.execute_sql into the compact JSON text the
+MCP tools return. Kept free of server state and fully annotated so it can
+be compiled with mypyc; server.py imports whichever is present:
+
+  cd mcp_server && mypyc formatting.py    # optional, builds formatting.*.so
+
+Without the compiled extension the pure-Python module is used unchanged.
+"""
+
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Any, Callable, Iterable, Optional, Sized
+
+# safe_value() runs once per result cell, so exact types are dispatched with
+# a single set/dict lookup; only subclasses reach the isinstance chain.
+_SAFE_PASSTHROUGH = frozenset({str, int, float, bool, type(None)})
+_SAFE_CONVERTERS: dict[type, Callable[[Any], Any]] = {
+    datetime: datetime.isoformat,
+    date: date.isoformat,
+    Decimal: float,
+    bytes: bytes.hex,
+}
+
+# json.dumps() with non-default options builds a new JSONEncoder per call;
+# build it once. default=str covers anything safe_value passes through
+# as-is (UUID, time, ...).
+_encode_table = json.JSONEncoder(
+    default=str, ensure_ascii=False, separators=(",", ":")
+).encode
+
+
+def safe_value(val: Any) -> Any:
+    """Convert non-JSON-serializable types to safe values."""
+    val_type = type(val)
+    if val_type in _SAFE_PASSTHROUGH:
+        return val
+    convert = _SAFE_CONVERTERS.get(val_type)
+    if convert is not None:
+        return convert(val)
+    if isinstance(val, (datetime, date)):
+        return val.isoformat()
+    if isinstance(val, Decimal):
+        return float(val)
+    if isinstance(val, bytes):
+        return val.hex()
+    return val
+
+
+def _cell(val: Any, max_chars: int) -> Any:
+    """safe_value(val), with strings longer than max_chars cut and marked with '…'."""
+    val = safe_value(val)
+    if max_chars and isinstance(val, str) and len(val) > max_chars:
+        return val[:max_chars] + "…"
+    return val
+
+
+def format_table(columns: list, rows: Iterable, limit: int, max_chars: int = 200) -> str:
+    """
+    Format up to `limit` rows as compact JSON: {"columns": [...], "rows": [[...]]}.
+
+    Rows stay positional (column names can repeat in joins). Text cells
+    longer than `max_chars` (0 = no limit) are truncated so one wide column
+    cannot blow up the response sent back to the LLM. `rows` may be a list
+    or an iterator; it is walked once and at most limit + 1 rows are read.
+    """
+    total: Optional[int] = len(rows) if isinstance(rows, Sized) else None
+    head = list(islice(rows, limit + 1))
+    payload = _encode_table(
+        {"columns": columns, "rows": [[_cell(v, max_chars) for v in row] for row in head[:limit]]}
+    )
+    if len(head) > limit:
+        more = f"{total - limit} more rows" if total is not None else "more rows"
+        payload += f"\n... and {more}"
+    return payload
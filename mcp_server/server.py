@@ -20,16 +20,28 @@ Tools:
 Usage:
   python server.py                  # Default port 8003
   MCP_PORT=9000 python server.py    # Custom port
+
+  With HTTPS enabled both listeners run on uvloop + httptools when
+  installed (pip install "uvicorn[standard]").
+
+Semantic answer cache:
+  ask_database reuses answers for paraphrased questions when
+  AZURE_OPENAI_EMBEDDING_DEPLOYMENT is set (see agent.py).
+  MCP_SEMCACHE_THRESHOLD overrides the cosine-similarity threshold here.
 """
 
+import asyncio
 import os
 import sys
 import json
 import logging
 import ssl
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from datetime import datetime, date
-from decimal import Decimal
+from datetime import datetime
+from typing import Optional
 
 # Add parent directory to path so we can import agent.py
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -38,7 +50,9 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
-from mcp.server.fastmcp import FastMCP
+import agent  # after load_dotenv(): agent reads its configuration at import
+from formatting import format_table  # compiled by mypyc when built, else pure Python
+from mcp.server.fastmcp import Context, FastMCP
 
 # ---------------------------------------------------------------------------
 # Logging
@@ -71,6 +85,9 @@ access_logger.addHandler(_access_stdout)
 
 PORT = int(os.getenv("MCP_PORT", "8003"))
 HTTP_PORT = int(os.getenv("MCP_HTTP_PORT", "8004"))  # Plain HTTP port for local MCP clients
+SEMCACHE_THRESHOLD = os.getenv("MCP_SEMCACHE_THRESHOLD", "")  # Empty = agent default
+SCHEMA_TTL = float(os.getenv("MCP_SCHEMA_TTL", "3600"))  # Seconds before schema is re-discovered
+MAX_CELL_CHARS = int(os.getenv("MCP_MAX_CELL_CHARS", "200"))  # Per-cell cap in tool output; 0 = off
 
 # ---------------------------------------------------------------------------
 # HTTPS / SSL Configuration
@@ -91,10 +108,13 @@ def _generate_self_signed_cert(cert_path: Path, key_path: Path) -> None:
         from cryptography import x509
         from cryptography.x509.oid import NameOID
         from cryptography.hazmat.primitives import hashes, serialization
-        from cryptography.hazmat.primitives.asymmetric import rsa
+        from cryptography.hazmat.primitives.asymmetric import ec
         import datetime as _dt
+        import ipaddress
 
-        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        # P-256 keygen is near-instant (RSA-2048 takes hundreds of ms) and
+        # gives smaller certs / cheaper TLS handshakes.
+        key = ec.generate_private_key(ec.SECP256R1())
 
         subject = issuer = x509.Name([
             x509.NameAttribute(NameOID.COMMON_NAME, "text2sql-mcp"),
@@ -143,6 +163,26 @@ def _generate_self_signed_cert(cert_path: Path, key_path: Path) -> None:
         raise
 
 
+CERT_RENEW_DAYS = 30  # regenerate the self-signed cert when it expires sooner
+
+
+def _cert_is_fresh(cert_path: Path) -> bool:
+    """Return True if *cert_path* is a readable cert valid for CERT_RENEW_DAYS more days."""
+    try:
+        from cryptography import x509
+        import datetime as _dt
+
+        cert = x509.load_pem_x509_certificate(cert_path.read_bytes())
+        try:
+            not_after = cert.not_valid_after_utc
+        except AttributeError:  # cryptography < 42: naive datetime in UTC
+            not_after = cert.not_valid_after.replace(tzinfo=_dt.timezone.utc)
+        remaining = not_after - _dt.datetime.now(_dt.timezone.utc)
+        return remaining > _dt.timedelta(days=CERT_RENEW_DAYS)
+    except (ImportError, OSError, ValueError):
+        return False
+
+
 def _resolve_ssl_paths() -> tuple:
     """Resolve SSL cert/key file paths. Returns (certfile, keyfile) or (None, None)."""
     if not ENABLE_HTTPS:
@@ -159,17 +199,21 @@ def _resolve_ssl_paths() -> tuple:
             logger.error(f"SSL cert/key not found: {cert}, {key}")
             raise FileNotFoundError(f"SSL files not found: {cert}, {key}")
 
-    # Auto-generate self-signed if defaults don't exist
+    # Auto-generate self-signed if defaults don't exist or are about to expire
     if not DEFAULT_CERTFILE.is_file() or not DEFAULT_KEYFILE.is_file():
         logger.info("No SSL certificates found — generating self-signed certificate...")
         _generate_self_signed_cert(DEFAULT_CERTFILE, DEFAULT_KEYFILE)
+    elif not _cert_is_fresh(DEFAULT_CERTFILE):
+        logger.info(
+            f"Self-signed certificate invalid or expiring within {CERT_RENEW_DAYS} days — regenerating..."
+        )
+        _generate_self_signed_cert(DEFAULT_CERTFILE, DEFAULT_KEYFILE)
+    else:
+        logger.info(f"Reusing existing self-signed certificate: {DEFAULT_CERTFILE}")
 
     return str(DEFAULT_CERTFILE), str(DEFAULT_KEYFILE)
 
 
-import ipaddress  # needed for SAN IP addresses in cert generation
-
-
 # ---------------------------------------------------------------------------
 # Access Log Middleware (ASGI)
 # ---------------------------------------------------------------------------
@@ -273,22 +317,98 @@ mcp = FastMCP(
 # ---------------------------------------------------------------------------
 # Helpers
 # ---------------------------------------------------------------------------
-def _safe(val):
-    """Convert non-JSON-serializable types to safe values."""
-    if isinstance(val, (datetime, date)):
-        return val.isoformat()
-    if isinstance(val, Decimal):
-        return float(val)
-    if isinstance(val, bytes):
-        return val.hex()
-    return val
+def _row_count(rows: list, truncated: bool) -> str:
+    """'N rows', flagged when the agent cut the result at SQL_MAX_ROWS."""
+    if truncated:
+        return f"{len(rows)} rows, truncated at the server row limit; the query returned more"
+    return f"{len(rows)} rows"
+
+
+# When the agent's cached schema was (re)loaded; 0.0 = not yet
+_schema_loaded_at = 0.0
+
+
+def _refresh_schema_if_stale() -> None:
+    """Drop the agent's cached schema once it is older than MCP_SCHEMA_TTL."""
+    global _schema_loaded_at
+    now = time.monotonic()
+    if _schema_loaded_at and now - _schema_loaded_at > SCHEMA_TTL:
+        logger.info("Schema cache expired — re-discovering on next use")
+        agent.reset_schema_cache()
+        _schema_loaded_at = 0.0
+    if not _schema_loaded_at:
+        _schema_loaded_at = now
+
+
+def _schema_text() -> str:
+    """Return the database schema, served from the agent's cache."""
+    _refresh_schema_if_stale()
+    return agent.discover_schema()
+
+
+def _warm_up() -> None:
+    """Discover the schema and open a DB connection before serving requests."""
+    try:
+        agent.warm_up()
+        _refresh_schema_if_stale()
+        logger.info("Schema pre-cached at startup")
+    except Exception as e:
+        logger.warning(f"Startup warm-up failed, schema will load on first use: {e}")
+
+
+def _configure_semantic_cache() -> None:
+    """Apply MCP_SEMCACHE_THRESHOLD to agent.py's semantic cache and log its state."""
+    if not agent.EMBEDDING_DEPLOYMENT:
+        logger.info("Semantic cache disabled (AZURE_OPENAI_EMBEDDING_DEPLOYMENT not set)")
+        return
+    if SEMCACHE_THRESHOLD:
+        agent.semantic_cache.threshold = float(SEMCACHE_THRESHOLD)
+    logger.info(f"Semantic cache enabled (threshold {agent.semantic_cache.threshold})")
+
+
+# ---------------------------------------------------------------------------
+# Request coalescing for ask_database
+# ---------------------------------------------------------------------------
+# Identical questions (ignoring case and whitespace) that arrive while one is
+# already being answered share its run instead of starting another. Plain
+# thread futures are used because the HTTP and HTTPS servers each run their
+# own event loop.
+_ask_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix="ask")
+_inflight: dict[str, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _process_coalesced(question: str, on_progress=None) -> Future:
+    """
+    Return a future for process_question(question), joining an in-flight run
+    if any. on_progress only receives updates when this call starts the run.
+    """
+    key = " ".join(question.lower().split())
+    with _inflight_lock:
+        future = _inflight.get(key)
+        if future is not None:
+            logger.info("ask_database: joined in-flight request for the same question")
+            return future
+        future = _inflight[key] = _ask_executor.submit(
+            agent.process_question, question, on_progress
+        )
+
+    def _forget(done: Future) -> None:
+        with _inflight_lock:
+            if _inflight.get(key) is done:
+                del _inflight[key]
+
+    future.add_done_callback(_forget)
+    return future
 
 
 # ---------------------------------------------------------------------------
 # MCP Tools
 # ---------------------------------------------------------------------------
+# The agent pipeline is blocking (pyodbc + OpenAI SDK), so tools run it in a
+# worker thread and the event loop stays free for concurrent MCP clients.
 @mcp.tool()
-def ask_database(question: str) -> str:
+async def ask_database(question: str, ctx: Context) -> str:
     """
     Ask a natural language question about the SalesDB database.
 
@@ -305,12 +425,42 @@ def ask_database(question: str) -> str:
         question: A natural language question about the sales database
 
     Returns:
-        Natural language answer with SQL query and data results
+        Natural language answer with the SQL query and data results (JSON)
     """
-    import agent
-
     logger.info(f"ask_database: {question}")
-    result = agent.process_question(question)
+    _refresh_schema_if_stale()
+
+    # Stage updates go to the client as progress + log notifications on the
+    # Streamable HTTP response while the answer is being prepared. Each one
+    # waits for the previous, and all are flushed before the final 3/3 and
+    # the tool result, so the client sees them in order.
+    loop = asyncio.get_running_loop()
+    pending: list[Future] = []
+
+    async def _notify(message: str, step: int, previous: Optional[Future]) -> None:
+        if previous is not None:
+            await asyncio.wait([asyncio.wrap_future(previous)])
+        await ctx.report_progress(step, 3)
+        await ctx.info(message)
+
+    def on_progress(message: str) -> None:
+        previous = pending[-1] if pending else None
+        pending.append(
+            asyncio.run_coroutine_threadsafe(
+                _notify(message, len(pending) + 1, previous), loop
+            )
+        )
+
+    # Shielded: one caller going away must not cancel a run others share
+    future = _process_coalesced(question, on_progress)
+    result = await asyncio.shield(asyncio.wrap_future(future))
+    # A failed notification (client gone) must not fail the tool call
+    await asyncio.gather(
+        *(asyncio.wrap_future(f) for f in pending), return_exceptions=True
+    )
+    await ctx.report_progress(3, 3)
+    if result.get("cache_hit"):
+        logger.info("ask_database: served from cache")
 
     if result.get("error"):
         return f"Error: {result['error']}"
@@ -323,18 +473,14 @@ def ask_database(question: str) -> str:
     if result.get("columns") and result.get("rows"):
         cols = result["columns"]
         rows = result["rows"]
-        parts.append(f"\nData ({len(rows)} rows):")
-        parts.append(" | ".join(cols))
-        for row in rows[:25]:
-            parts.append(" | ".join(str(_safe(v)) for v in row))
-        if len(rows) > 25:
-            parts.append(f"... and {len(rows) - 25} more rows")
+        parts.append(f"\nData ({_row_count(rows, result.get('truncated', False))}):")
+        parts.append(format_table(cols, rows, 25, MAX_CELL_CHARS))
 
     return "\n".join(parts)
 
 
 @mcp.tool()
-def get_database_schema() -> str:
+async def get_database_schema() -> str:
     """
     Get the complete SalesDB database schema.
 
@@ -345,14 +491,12 @@ def get_database_schema() -> str:
     Returns:
         Database schema as formatted text
     """
-    import agent
-
     logger.info("get_database_schema called")
-    return agent.discover_schema()
+    return await asyncio.to_thread(_schema_text)
 
 
 @mcp.tool()
-def run_sql_query(sql_query: str) -> str:
+async def run_sql_query(sql_query: str) -> str:
     """
     Execute a T-SQL SELECT query against the SalesDB database.
 
@@ -363,21 +507,16 @@ def run_sql_query(sql_query: str) -> str:
         sql_query: A T-SQL SELECT query (e.g., "SELECT TOP 10 * FROM Products")
 
     Returns:
-        Query results as formatted text with column headers and rows
+        Row count, then the results as JSON ({"columns": [...], "rows": [[...]]})
     """
-    import agent
-
     logger.info(f"run_sql_query: {sql_query[:100]}")
     try:
-        columns, rows = agent.execute_sql(sql_query)
+        columns, rows, truncated = await asyncio.to_thread(agent.execute_sql, sql_query)
         if not columns:
             return "Query executed successfully but returned no results."
-        parts = [f"Results ({len(rows)} rows):", " | ".join(columns)]
-        for row in rows[:50]:
-            parts.append(" | ".join(str(_safe(v)) for v in row))
-        if len(rows) > 50:
-            parts.append(f"... and {len(rows) - 50} more rows")
-        return "\n".join(parts)
+        return f"Results ({_row_count(rows, truncated)}):\n" + format_table(
+            columns, rows, 50, MAX_CELL_CHARS
+        )
     except Exception as e:
         return f"SQL Error: {str(e)}"
 
@@ -386,11 +525,9 @@ def run_sql_query(sql_query: str) -> str:
 # MCP Resource
 # ---------------------------------------------------------------------------
 @mcp.resource("schema://salesdb")
-def salesdb_schema() -> str:
+async def salesdb_schema() -> str:
     """Complete SalesDB database schema with tables, columns, and relationships."""
-    import agent
-
-    return agent.discover_schema()
+    return await asyncio.to_thread(_schema_text)
 
 
 # ---------------------------------------------------------------------------
@@ -422,12 +559,29 @@ def _create_mcp_instance(name_suffix="", port=PORT):
     return instance
 
 
+def _uvicorn_speedups() -> dict:
+    """uvicorn loop/http options: uvloop + httptools when installed (uvloop is POSIX-only)."""
+    from importlib.util import find_spec
+
+    opts = {}
+    if sys.platform != "win32" and find_spec("uvloop") is not None:
+        opts["loop"] = "uvloop"
+    if find_spec("httptools") is not None:
+        opts["http"] = "httptools"
+    if len(opts) < 2:
+        logger.info("uvloop/httptools not fully available — using uvicorn defaults for the rest")
+    return opts
+
+
 if __name__ == "__main__":
+    _configure_semantic_cache()
+    _warm_up()
     certfile, keyfile = _resolve_ssl_paths()
 
     if certfile and keyfile:
         import uvicorn
-        import threading
+
+        speedups = _uvicorn_speedups()
 
         # Start plain HTTP server on MCP_HTTP_PORT for local clients (VS Code)
         def run_http():
@@ -435,7 +589,9 @@ if __name__ == "__main__":
             logger.info(f"MCP endpoint (HTTP): http://0.0.0.0:{HTTP_PORT}/mcp")
             mcp_http = _create_mcp_instance("http", HTTP_PORT)
             http_app = AccessLogMiddleware(mcp_http.streamable_http_app())
-            uvicorn.run(http_app, host="0.0.0.0", port=HTTP_PORT, log_level="info")
+            uvicorn.run(
+                http_app, host="0.0.0.0", port=HTTP_PORT, log_level="info", **speedups
+            )
 
         http_thread = threading.Thread(target=run_http, daemon=True)
         http_thread.start()
@@ -453,6 +609,7 @@ if __name__ == "__main__":
             ssl_certfile=certfile,
             ssl_keyfile=keyfile,
             log_level="info",
+            **speedups,
         )
     else:
         logger.info(f"Starting Text2SQL MCP server on port {PORT} (HTTP)")
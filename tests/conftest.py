@@ -0,0 +1,15 @@
+"""
+Test setup: the services import their siblings by bare name (``import agent``,
+``from models import ...``), as they do on the VM, so put those directories
+on sys.path.
+"""
+
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+for _subdir in ("app", "a2a"):
+    _path = os.path.join(ROOT, _subdir)
+    if _path not in sys.path:
+        sys.path.insert(0, _path)
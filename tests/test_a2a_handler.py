@@ -0,0 +1,90 @@
+"""Tests for the A2A task lifecycle in a2a/handler.py."""
+
+import pytest
+
+# handler imports agent, which needs pyodbc and the unixODBC driver manager
+pytest.importorskip("pyodbc", exc_type=ImportError)
+
+import handler
+from handler import handle_task_cancel, handle_task_get, handle_task_send
+from models import (
+    Message,
+    TaskCancelParams,
+    TaskQueryParams,
+    TaskSendParams,
+    TaskState,
+    TextPart,
+)
+
+
+def _send_params(task_id: str, text: str = "How many customers are there?") -> TaskSendParams:
+    return TaskSendParams(
+        id=task_id, message=Message(role="user", parts=[TextPart(text=text)])
+    )
+
+
+def _result(answer: str = "There are 42 customers.") -> dict:
+    return {"answer": answer, "sql": "SELECT 42", "columns": ["n"], "rows": [(42,)]}
+
+
+def test_send_completes(monkeypatch):
+    monkeypatch.setattr(handler.agent, "process_question", lambda q: _result())
+
+    task = handle_task_send(_send_params("send-ok"))
+
+    assert task.status.state == TaskState.COMPLETED
+    assert [s.state for s in task.history] == [TaskState.SUBMITTED, TaskState.WORKING]
+    assert [a.name for a in task.artifacts] == ["answer", "query_result"]
+    assert [m.role for m in task.messages] == ["user", "agent"]
+
+
+def test_cancel_during_send_stays_canceled(monkeypatch):
+    task_id = "cancel-during-send"
+
+    def process_question(question):
+        # tasks/cancel arrives while the pipeline is still running
+        canceled = handle_task_cancel(TaskCancelParams(id=task_id))
+        assert canceled.status.state == TaskState.CANCELED
+        return _result()
+
+    monkeypatch.setattr(handler.agent, "process_question", process_question)
+
+    events = []
+    task = handle_task_send(_send_params(task_id), on_event=events.append)
+
+    stored = handle_task_get(TaskQueryParams(id=task_id))
+    for t in (task, stored):
+        assert t.status.state == TaskState.CANCELED
+        assert [s.state for s in t.history] == [TaskState.SUBMITTED, TaskState.WORKING]
+        assert t.artifacts == []
+        assert [m.role for m in t.messages] == ["user"]
+    # No artifacts or completion after the cancel, but the stream still
+    # ends with a final event carrying the canceled status
+    assert [type(e).__name__ for e in events] == ["TaskStatusUpdateEvent"] * 2
+    assert [e.status.state for e in events] == [TaskState.WORKING, TaskState.CANCELED]
+    assert [e.final for e in events] == [False, True]
+
+
+def test_send_events_end_with_final(monkeypatch):
+    monkeypatch.setattr(handler.agent, "process_question", lambda q: _result())
+
+    events = []
+    handle_task_send(_send_params("send-events"), on_event=events.append)
+
+    assert [type(e).__name__ for e in events] == [
+        "TaskStatusUpdateEvent",
+        "TaskArtifactUpdateEvent",
+        "TaskArtifactUpdateEvent",
+        "TaskStatusUpdateEvent",
+    ]
+    assert events[-1].final and events[-1].status.state == TaskState.COMPLETED
+
+
+def test_cancel_after_completion_is_noop(monkeypatch):
+    monkeypatch.setattr(handler.agent, "process_question", lambda q: _result())
+    handle_task_send(_send_params("cancel-after-done"))
+
+    task = handle_task_cancel(TaskCancelParams(id="cancel-after-done"))
+
+    assert task.status.state == TaskState.COMPLETED
+    assert len(task.history) == 2
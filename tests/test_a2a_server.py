@@ -0,0 +1,95 @@
+"""Tests for the A2A JSON-RPC endpoint in a2a/server.py."""
+
+import asyncio
+import dataclasses
+import json
+import threading
+
+import pytest
+
+# server imports handler -> agent, which needs pyodbc and the unixODBC driver manager
+pytest.importorskip("pyodbc", exc_type=ImportError)
+
+from fastapi.testclient import TestClient
+
+import handler
+import server
+from models import TaskCancelParams
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(server, "CFG", dataclasses.replace(server.CFG, api_key=b""))
+    return TestClient(server.app)
+
+
+def _rpc(client, method, params):
+    return client.post("/", json={"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+
+
+@pytest.mark.parametrize("params", [None, [], ["q"], "q", 3])
+@pytest.mark.parametrize(
+    "method", ["tasks/send", "tasks/sendSubscribe", "tasks/get", "tasks/cancel"]
+)
+def test_non_object_params_are_invalid(client, method, params):
+    response = _rpc(client, method, params)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["id"] == 1
+    assert body["error"]["code"] == -32602
+
+
+def test_unknown_method_wins_over_bad_params(client):
+    response = _rpc(client, "tasks/unknown", None)
+
+    assert response.json()["error"]["code"] == -32601
+
+
+def test_missing_params_still_reach_the_handler(client):
+    response = client.post("/", json={"jsonrpc": "2.0", "id": 1, "method": "tasks/get"})
+
+    assert response.json()["error"]["code"] == -32001  # task "" not found
+
+
+def test_send_subscribe_ends_with_final_event_after_cancel(client, monkeypatch):
+    def process_question(question):
+        handler.handle_task_cancel(TaskCancelParams(id="sub-cancel"))
+        return {"answer": "42", "sql": "SELECT 42", "columns": ["n"], "rows": [(42,)]}
+
+    monkeypatch.setattr(handler.agent, "process_question", process_question)
+
+    response = _rpc(
+        client,
+        "tasks/sendSubscribe",
+        {"id": "sub-cancel", "message": {"role": "user", "parts": [{"type": "text", "text": "q?"}]}},
+    )
+
+    events = [
+        json.loads(line[len("data: "):])["result"]
+        for line in response.text.split("\n\n")
+        if line.startswith("data: ")
+    ]
+    assert [e["status"]["state"] for e in events] == ["working", "canceled"]
+    assert events[-1]["final"] is True
+
+
+def test_cancelled_request_holds_its_slot_until_the_thread_finishes(monkeypatch):
+    started, finish = threading.Event(), threading.Event()
+
+    def handle(_params):
+        started.set()
+        finish.wait(5)
+
+    async def scenario():
+        monkeypatch.setattr(server, "_inflight", asyncio.Semaphore(1))
+        task = asyncio.ensure_future(server._run_blocking(handle, None))
+        await asyncio.get_running_loop().run_in_executor(None, started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert server._inflight.locked()  # handler thread is still running
+        finish.set()
+        await asyncio.wait_for(server._inflight.acquire(), 5)
+
+    asyncio.run(scenario())
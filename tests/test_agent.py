@@ -0,0 +1,212 @@
+"""Tests for the SQL execution helpers in app/agent.py."""
+
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+import pytest
+
+# agent needs pyodbc and the unixODBC driver manager
+pytest.importorskip("pyodbc", exc_type=ImportError)
+
+import agent
+
+
+class _FakeCursor:
+    def __init__(self, n_rows: int) -> None:
+        self._rows = iter([(i,) for i in range(n_rows)])
+        self.description = None
+
+    def execute(self, sql: str) -> None:
+        self.description = [("n",)]
+
+    def fetchmany(self, size: int) -> list:
+        return [row for _, row in zip(range(size), self._rows)]
+
+
+class _FakeConnection:
+    def __init__(self, n_rows: int) -> None:
+        self.n_rows = n_rows
+
+    def cursor(self) -> _FakeCursor:
+        return _FakeCursor(self.n_rows)
+
+
+class _FakePool:
+    def __init__(self, n_rows: int) -> None:
+        self.n_rows = n_rows
+
+    @contextmanager
+    def acquire(self):
+        yield _FakeConnection(self.n_rows)
+
+
+@pytest.mark.parametrize(
+    "n_rows, expected_len, truncated",
+    [(0, 0, False), (10, 10, False), (25, 25, False), (26, 25, True), (1000, 25, True)],
+)
+def test_execute_sql_flags_truncation(monkeypatch, n_rows, expected_len, truncated):
+    monkeypatch.setattr(agent, "SQL_MAX_ROWS", 25)
+    monkeypatch.setattr(agent, "db_pool", _FakePool(n_rows))
+
+    columns, rows, was_truncated = agent.execute_sql("SELECT n FROM T")
+
+    assert columns == ["n"]
+    assert len(rows) == expected_len
+    assert was_truncated is truncated
+
+
+def test_synthesis_prompt_mentions_truncation():
+    rows = [(1,), (2,)]
+    full = agent._synthesis_messages("q", "SELECT 1", ["n"], rows)[1]["content"]
+    cut = agent._synthesis_messages("q", "SELECT 1", ["n"], rows, truncated=True)[1]["content"]
+
+    assert "Results (2 rows)" in full
+    assert "returned more" in cut
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT TOP 5 * FROM dbo.Customers",
+        "SELECT 1;",
+        "SELECT 1; -- trailing comment",
+        "WITH cte AS (SELECT 1 AS n) SELECT n FROM cte",
+        ";WITH cte AS (SELECT 1 AS n) SELECT n FROM cte",
+        "  ;\n WITH cte AS (SELECT 1 AS n) SELECT n FROM cte;",
+        "(SELECT 1) UNION (SELECT 2)",
+        "((SELECT 1)) UNION ALL SELECT 2",
+        "SELECT Backup FROM X",
+        "SELECT Backup, Restore AS r FROM dbo.Jobs WHERE Kill = 0",
+        "SELECT j.Backup FROM Jobs j ORDER BY Backup DESC",
+        "SELECT x FROM Backup",
+        "SELECT x FROM Backup b JOIN Restore r ON b.id = r.id",
+        "SELECT [Delete], 'DROP TABLE t' AS note FROM t -- INSERT INTO",
+        "SELECT * FROM Orders WHERE Status IN ('INSERT', 'UPDATE')",
+        "SELECT s.[Set], Begin, [Exec] FROM Steps s WHERE s.Commit = 1",
+        "SELECT p.Id FROM Prices p ORDER BY p.Id OFFSET 10 ROWS FETCH NEXT 5 ROWS ONLY",
+    ],
+)
+def test_check_read_only_accepts_single_select(sql):
+    assert agent.check_read_only(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT 1; DROP TABLE Customers",
+        "SELECT 1; SELECT 2",
+        ";WITH c AS (SELECT 1 AS n) SELECT n FROM c; DELETE FROM Orders",
+    ],
+)
+def test_check_read_only_rejects_multiple_statements(sql):
+    with pytest.raises(ValueError, match="single SQL statement"):
+        agent.check_read_only(sql)
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * INTO dbo.Copy FROM dbo.Customers",
+        "SELECT a, b INTO #tmp FROM t",
+        "SELECT 1 DROP TABLE Customers",
+        "SELECT 1 DELETE FROM Orders",
+        "SELECT 1 UPDATE Orders SET Total = 0",
+        "SELECT 1 EXEC sp_who",
+        "SELECT 1 EXEC('DROP TABLE t')",
+        "SELECT * FROM OPENROWSET('SQLNCLI', 'x', 'SELECT 1')",
+        "WITH c AS (SELECT 1 AS n) INSERT INTO t SELECT n FROM c",
+        "SELECT 1 EXECUTE AS LOGIN = 'sa'",
+        "SELECT 1 EXECUTE AS USER = 'dbo'",
+        "SELECT x FROM t EXEC sp_who",
+        "SELECT 1 BEGIN TRAN",
+        "SELECT 1 BEGIN TRANSACTION SELECT 2 COMMIT",
+        "SELECT 1 COMMIT",
+        "SELECT 1 DECLARE @x INT SET @x = 1",
+        "SELECT 1 SET NOCOUNT ON",
+        "SELECT 1 SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED",
+        "SELECT 1 REVERT",
+        "SELECT 1 USE master",
+        "SELECT 1 WAITFOR DELAY '00:00:05'",
+        "WITH c AS (SELECT 1 AS n) SELECT n FROM c SET ANSI_NULLS OFF",
+        "SELECT 1 SHUTDOWN",
+    ],
+)
+def test_check_read_only_rejects_writes(sql):
+    with pytest.raises(ValueError, match="read-only"):
+        agent.check_read_only(sql)
+
+
+@pytest.mark.parametrize(
+    "sql", ["DELETE FROM Orders", "UPDATE t SET a = 1", "EXEC sp_who", "(DELETE FROM t)", ""]
+)
+def test_check_read_only_rejects_non_select(sql):
+    with pytest.raises(ValueError, match="Only SELECT"):
+        agent.check_read_only(sql)
+
+
+def test_check_read_only_strips_semicolons():
+    assert agent.check_read_only(";WITH c AS (SELECT 1 AS n) SELECT n FROM c;") == (
+        "WITH c AS (SELECT 1 AS n) SELECT n FROM c"
+    )
+
+
+@pytest.fixture
+def result_cache(monkeypatch):
+    """Empty result cache, a fake clock, and an execute_sql that returns N rows for "SELECT TOP N"."""
+    clock = SimpleNamespace(now=1000.0)
+    calls = []
+
+    def execute_sql(sql):
+        calls.append(sql)
+        n = int(sql.split()[-1])
+        return ["n"], [(i,) for i in range(n)], n > 50
+
+    monkeypatch.setattr(agent, "time", SimpleNamespace(monotonic=lambda: clock.now))
+    monkeypatch.setattr(agent, "execute_sql", execute_sql)
+    monkeypatch.setattr(agent, "SQL_RESULT_CACHE_TTL", 60.0)
+    monkeypatch.setattr(agent, "SQL_RESULT_CACHE_MAX_ROWS", 20)
+    monkeypatch.setattr(agent, "_result_cache", agent.OrderedDict())
+    return SimpleNamespace(clock=clock, calls=calls)
+
+
+def test_result_cache_serves_repeats(result_cache):
+    assert agent.execute_sql_cached("SELECT TOP 5")[3] is False
+    assert agent.execute_sql_cached("SELECT TOP 5")[3] is True
+    assert result_cache.calls == ["SELECT TOP 5"]
+
+
+def test_result_cache_sweeps_expired_entries_on_insert(result_cache):
+    for n in range(1, 6):
+        agent.execute_sql_cached(f"SELECT TOP {n}")
+    assert len(agent._result_cache) == 5
+
+    result_cache.clock.now += 61
+    agent.execute_sql_cached("SELECT TOP 6")
+
+    assert [key[1] for key in agent._result_cache] == ["SELECT TOP 6"]
+
+
+@pytest.mark.parametrize("sql", ["SELECT TOP 21", "SELECT TOP 60"])  # too big / truncated
+def test_result_cache_skips_large_results(result_cache, sql):
+    agent.execute_sql_cached(sql)
+    agent.execute_sql_cached(sql)
+
+    assert not agent._result_cache
+    assert result_cache.calls == [sql, sql]
+
+
+def test_get_schema_meta_survives_concurrent_reset(monkeypatch):
+    calls = []
+
+    def fake_discover():
+        # The first discovery is undone by a reset before the caller reads it.
+        calls.append(None)
+        monkeypatch.setattr(agent, "_schema_meta", {"schema_text": "t", "table_count": 1})
+        if len(calls) == 1:
+            agent.reset_schema_cache()
+        return "t"
+
+    monkeypatch.setattr(agent, "_schema_meta", None)
+    monkeypatch.setattr(agent, "discover_schema", fake_discover)
+    assert agent.get_schema_meta()["schema_text"] == "t"
+    assert len(calls) == 2